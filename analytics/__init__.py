@@ -0,0 +1,23 @@
+from .artifacts import Artifacts
+from .backend import Backend, DuckDBBackend, PandasBackend
+from .cube import build_cube, merge_cubes, to_store
+from .dimensions import Dimensions
+from .od import ODMatrix
+from .sketch import LogBins, QuantileSketches
+from .state import DashboardState, kpi_metrics
+
+__all__ = [
+    'Artifacts',
+    'Backend',
+    'build_cube',
+    'DashboardState',
+    'Dimensions',
+    'DuckDBBackend',
+    'kpi_metrics',
+    'LogBins',
+    'merge_cubes',
+    'ODMatrix',
+    'PandasBackend',
+    'QuantileSketches',
+    'to_store',
+]
@@ -0,0 +1,168 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+from datetime import datetime
+
+
+class Artifacts:
+    """
+    Version of derived dashboard state written by `build_artifacts.py`, under root/<version>. Arrays are stored as .npy
+     files and memory-mapped on load, so versions are shared between processes through the page cache. Arrays are
+     named like group/name, a group of equal length arrays loads as a frame. manifest.json lists arrays, documents and
+     files of the version with its metadata, it is written last so a version without manifest is ignored.
+    """
+    def __init__(self, path):
+        """
+        :param str path: Directory of version
+        """
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self.metadata = self.manifest['metadata']
+
+    @staticmethod
+    def versions(root):
+        """
+        Return complete versions under root, oldest first.
+
+        :param str root: Root directory of versions
+        :return: Versions
+        :rtype: list
+        """
+        if not os.path.isdir(root):
+            return []
+        versions = []
+        for version in os.listdir(root):
+            manifest = os.path.join(root, version, 'manifest.json')
+            if os.path.exists(manifest):
+                with open(manifest) as f:
+                    versions.append((json.load(f)['created'], version))
+        return [version for _, version in sorted(versions)]
+
+    @classmethod
+    def open(cls, root, version='latest'):
+        """
+        Open given version under root, latest version if version is latest.
+
+        :param str root: Root directory of versions
+        :param str version: Version or latest
+        :return: Artifacts
+        :rtype: Artifacts
+        """
+        if version == 'latest':
+            versions = cls.versions(root)
+            if len(versions) == 0:
+                raise Exception(f'There are no artifacts under "{root}"')
+            version = versions[-1]
+        path = os.path.join(root, version)
+        if not os.path.exists(os.path.join(path, 'manifest.json')):
+            raise Exception(f'Artifacts version does not exists "{path}"')
+        return cls(path)
+
+    @classmethod
+    def write(cls, root, version, arrays=None, documents=None, files=None, metadata=None):
+        """
+        Write a new version under root. Version is written to a temporary directory and renamed when complete.
+
+        :param str root: Root directory of versions
+        :param str version: Version, like build time
+        :param dict or None arrays: Numeric arrays by name
+        :param dict or None documents: JSON serializable documents by name
+        :param dict or None files: Paths of files to copy by name
+        :param dict or None metadata: JSON serializable metadata
+        :return: Written artifacts
+        :rtype: Artifacts
+        """
+        path = os.path.join(root, version)
+        if os.path.exists(path):
+            raise Exception(f'Artifacts version already exists "{path}"')
+        tmp = os.path.join(root, f'.{version}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        manifest = {
+            'version': version,
+            'created': datetime.utcnow().isoformat(),
+            'arrays': {},
+            'documents': {},
+            'files': {},
+            'metadata': metadata or {},
+        }
+        for name, values in (arrays or {}).items():
+            values = np.asarray(values)
+            if values.dtype == object:
+                raise ValueError(f'Array "{name}" is not numeric and can not be memory-mapped')
+            file = f'{name}.npy'
+            os.makedirs(os.path.dirname(os.path.join(tmp, file)), exist_ok=True)
+            np.save(os.path.join(tmp, file), values)
+            manifest['arrays'][name] = {'file': file, 'dtype': str(values.dtype), 'shape': list(values.shape)}
+        for name, document in (documents or {}).items():
+            file = f'{name}.json'
+            with open(os.path.join(tmp, file), 'w') as f:
+                json.dump(document, f)
+            manifest['documents'][name] = file
+        for name, source in (files or {}).items():
+            shutil.copyfile(source, os.path.join(tmp, name))
+            manifest['files'][name] = name
+
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp, path)
+        return cls(path)
+
+    def array(self, name):
+        """
+        Return memory-mapped array of given name.
+
+        :param str name: Name of array
+        :return: Read-only array
+        :rtype: np.ndarray
+        """
+        return np.load(os.path.join(self.path, self.manifest['arrays'][name]['file']), mmap_mode='r')
+
+    def arrays(self, group):
+        """
+        Return memory-mapped arrays of given group by their names in group.
+
+        :param str group: Group of arrays
+        :return: Read-only arrays
+        :rtype: dict
+        """
+        prefix = f'{group}/'
+        return {name[len(prefix):]: self.array(name) for name in self.manifest['arrays'] if name.startswith(prefix)}
+
+    def frame(self, group):
+        """
+        Return frame of memory-mapped arrays of given group as columns, without copying them.
+
+        :param str group: Group of arrays
+        :return: Frame
+        :rtype: pd.DataFrame
+        """
+        arrays = self.arrays(group)
+        if len(arrays) == 0:
+            raise Exception(f'There are no arrays of "{group}" in artifacts "{self.path}"')
+        return pd.DataFrame(arrays, copy=False)
+
+    def document(self, name):
+        """
+        Return document of given name.
+
+        :param str name: Name of document
+        :return: Document
+        """
+        with open(os.path.join(self.path, self.manifest['documents'][name])) as f:
+            return json.load(f)
+
+    def file(self, name):
+        """
+        Return path of file of given name.
+
+        :param str name: Name of file
+        :return: Path of file
+        :rtype: str
+        """
+        return os.path.join(self.path, self.manifest['files'][name])
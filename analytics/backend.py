@@ -0,0 +1,224 @@
+import glob
+import numpy as np
+import os
+import pandas as pd
+from analytics.cube import build_cube, merge_cubes
+from functools import lru_cache
+
+# Aggregation functions every backend understands, with their SQL counterparts
+FUNCTIONS = {
+    'size': 'count(*)',
+    'count': 'count("{column}")',
+    'sum': 'sum("{column}")',
+}
+
+
+class Backend:
+    """
+    Query interface dashboard figures go through. Trips are exposed with their raw columns, borough keys of pick up and
+     drop off zones (PUBoroughID, DOBoroughID, -1 for unknown zones), pick up weekday and hour, and year and month of
+     the partition they are loaded from. Partitions are listed in `months` as sorted (year, month) pairs.
+    """
+    months = []
+
+    def aggregate(self, by, metrics, hours=None, days=None, months=None, dropna=True):
+        """
+        Aggregate trips of given hours range, days and months.
+
+        :param list by: Columns to group by, may be empty to aggregate all trips
+        :param dict metrics: Named aggregations as name: (column, function), functions are size, count and sum
+        :param tuple or None hours: Selected hours range, all hours if none
+        :param tuple or None days: Selected days, all days if none
+        :param tuple or None months: Selected (year, month) partitions, all months if none
+        :param bool dropna: Drop groups with missing values in grouped columns
+        :return: Grouped columns and metrics
+        :rtype: pd.DataFrame
+        """
+        raise NotImplementedError
+
+    def histogram(self, column, bins):
+        """
+        Count values of a column by year, month, pick up weekday, hour and bin, missing values are skipped.
+
+        :param str column: Column to count
+        :param LogBins bins: Bins of values
+        :return: year, month, weekday, hour, bin and count columns
+        :rtype: pd.DataFrame
+        """
+        raise NotImplementedError
+
+
+class PandasBackend(Backend):
+    """
+    Backend over data loaded into memory. Data is kept as one segment per month, aggregations run on selected segments
+     only and are merged, so results of a month are shared by every date range it is part of.
+    """
+    def __init__(self, df, cache_size=256):
+        """
+        :param pd.DataFrame df: Data from `Operations.get_main_data`
+        :param int cache_size: Number of month aggregations to keep
+        """
+        key = df['year'].to_numpy().astype(np.int64) * 100 + df['month'].to_numpy()
+        if not pd.Index(key).is_monotonic_increasing:
+            order = np.argsort(key, kind='stable')
+            df, key = df.iloc[order].reset_index(drop=True), key[order]
+        self.df = df
+
+        # Months are contiguous rows, so segments are slices sharing memory of data
+        starts = np.flatnonzero(np.diff(key, prepend=-1))
+        ends = np.append(starts[1:], len(key))
+        self.months = [divmod(int(key[start]), 100) for start in starts]
+        self.segments = {month: df.iloc[start:end] for month, start, end in zip(self.months, starts, ends)}
+        self.segment_cube = lru_cache(maxsize=cache_size)(self._segment_cube)
+
+    def _segment_cube(self, month, by, metrics, hours, days):
+        """
+        Aggregate trips of a month by pick up hours and days.
+
+        :param tuple month: Year and month of segment
+        :param tuple by: Columns to group by
+        :param tuple metrics: Named aggregations as (name, (column, function)) pairs
+        :param tuple or None hours: Selected hours range
+        :param tuple or None days: Selected days
+        :return: Grouped columns and metrics
+        :rtype: pd.DataFrame
+        """
+        df = self.segments[month]
+        mask = pd.Series(True, index=df.index)
+        if hours is not None:
+            mask &= df['hour'].between(min(hours), max(hours))
+        if days is not None:
+            mask &= df['weekday'].isin(days)
+        return build_cube(df if mask.all() else df[mask], list(by), dict(metrics))
+
+    def aggregate(self, by, metrics, hours=None, days=None, months=None, dropna=True):
+        hours = tuple(hours) if hours is not None else None
+        days = tuple(days) if days is not None else None
+        if months is not None:
+            months = set(map(tuple, months))
+        selected = [month for month in self.months if months is None or month in months]
+
+        # Unfiltered aggregations only run while the dashboard starts, filtered ones repeat and are cached
+        segment_cube = self.segment_cube if hours is not None or days is not None else self._segment_cube
+        cubes = [segment_cube(month, tuple(by), tuple(metrics.items()), hours, days) for month in selected]
+        if len(cubes) == 0:
+            cube = build_cube(self.df.iloc[:0], by, metrics)
+        elif len(cubes) == 1:
+            cube = cubes[0]
+        elif 'year' in by and 'month' in by:
+            cube = pd.concat(cubes, ignore_index=True)
+        else:
+            cube = merge_cubes(cubes, by)
+        return cube.dropna(subset=by) if dropna and len(by) > 0 else cube
+
+    def histogram(self, column, bins):
+        df = self.df[self.df[column].notna()]
+        df = pd.DataFrame({
+            'year': df['year'],
+            'month': df['month'],
+            'weekday': df['weekday'],
+            'hour': df['hour'],
+            'bin': bins.index(df[column].to_numpy(dtype='float64')),
+        })
+        return build_cube(df, ['year', 'month', 'weekday', 'hour', 'bin'], {'count': ('bin', 'size')})
+
+
+class DuckDBBackend(Backend):
+    """
+    Backend running multi-threaded, out-of-core aggregations with embedded DuckDB over month-partitioned Parquet files
+     written by `Operations.write_parquet`.
+    """
+    def __init__(self, root, dimensions, threads=0, memory_limit=''):
+        """
+        :param str root: Root directory of year=YYYY/month=MM partitions
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param int threads: Number of threads, all cores if zero
+        :param str memory_limit: Memory limit like 4GB, DuckDB default if empty
+        """
+        import duckdb
+
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f'SET threads = {int(threads)}')
+        if memory_limit:
+            self.conn.execute(f"SET memory_limit = '{memory_limit}'")
+        # Registered frames are only visible to this connection, tables are shared with cursors
+        self.conn.register('zones_frame', dimensions.zones[['LocationID', 'BoroughID']])
+        self.conn.execute('CREATE TABLE zones AS SELECT * FROM zones_frame')
+        self.conn.unregister('zones_frame')
+
+        files = os.path.join(root, '*', '*', '*.parquet')
+        self.months = sorted(
+            (int(os.path.basename(os.path.dirname(path)).split('=')[1]), int(os.path.basename(path).split('=')[1]))
+            for path in glob.glob(os.path.join(root, 'year=*', 'month=*'))
+        )
+        self.conn.execute(f"""
+            CREATE VIEW trips AS
+            SELECT
+                t.*,
+                isodow(t.lpep_pickup_datetime) - 1 AS weekday,
+                hour(t.lpep_pickup_datetime) AS hour,
+                coalesce(pz.BoroughID, -1) AS PUBoroughID,
+                coalesce(dz.BoroughID, -1) AS DOBoroughID,
+                round_even(
+                    ((epoch(t.lpep_dropoff_datetime) - epoch(t.lpep_pickup_datetime)) % 86400 + 86400) % 86400 / 60, 0
+                ) AS trip_time
+            FROM read_parquet(
+                '{files}',
+                hive_partitioning = true,
+                hive_types = {{'year': INTEGER, 'month': INTEGER}},
+                union_by_name = true
+            ) t
+            LEFT JOIN zones pz ON t.PULocationID = pz.LocationID
+            LEFT JOIN zones dz ON t.DOLocationID = dz.LocationID
+        """)
+
+    def query(self, query, params=None):
+        """
+        Run query over trips view.
+
+        :param str query: SQL query
+        :param list or None params: Query parameters
+        :return: Query result
+        :rtype: pd.DataFrame
+        """
+        # Cursors are separate connections to the same database, so callbacks can query from several threads
+        cursor = self.conn.cursor()
+        try:
+            return cursor.execute(query, params or []).df()
+        finally:
+            cursor.close()
+
+    def aggregate(self, by, metrics, hours=None, days=None, months=None, dropna=True):
+        columns = [f'"{c}"' for c in by]
+        selects = columns + [
+            f'{FUNCTIONS[func].format(column=column)} AS "{name}"' for name, (column, func) in metrics.items()
+        ]
+        where, params = [], []
+        if hours is not None:
+            where.append('hour BETWEEN ? AND ?')
+            params += [min(hours), max(hours)]
+        if days is not None:
+            where.append(f'weekday IN ({", ".join("?" for _ in days)})')
+            params += list(days)
+        if months is not None:
+            # Filters on partition columns alone skip files of other months
+            where.append(f'year * 100 + month IN ({", ".join("?" for _ in months)})' if len(months) > 0 else 'false')
+            params += [year * 100 + month for year, month in months]
+        if dropna:
+            where += [f'{c} IS NOT NULL' for c in columns]
+
+        query = f'SELECT {", ".join(selects)} FROM trips'
+        if len(where) > 0:
+            query += f' WHERE {" AND ".join(where)}'
+        if len(columns) > 0:
+            query += f' GROUP BY {", ".join(columns)} ORDER BY {", ".join(columns)}'
+        return self.query(query, params)
+
+    def histogram(self, column, bins):
+        return self.query(f"""
+            SELECT year, month, weekday, hour, {bins.sql(f'"{column}"')} AS bin, count(*) AS count
+            FROM trips
+            WHERE "{column}" IS NOT NULL
+            GROUP BY ALL
+        """)
@@ -0,0 +1,69 @@
+import pandas as pd
+
+
+def build_cube(df, dims, metrics):
+    """
+    Pre-aggregate data over given dimensions. Rows with missing dimension values are kept, so totals of the cube
+     match totals of the data.
+
+    :param pd.DataFrame df: Data to aggregate
+    :param list dims: Columns to group by, may be empty to aggregate all rows
+    :param dict metrics: Named aggregations as name: (column, function)
+    :return: Aggregated data
+    :rtype: pd.DataFrame
+    """
+    if len(dims) == 0:
+        return pd.DataFrame({
+            name: [len(df) if func == 'size' else df[column].agg(func)] for name, (column, func) in metrics.items()
+        })
+    return df.groupby(dims, dropna=False) \
+        .agg(**metrics) \
+        .reset_index(drop=False)
+
+
+def merge_cubes(cubes, dims):
+    """
+    Merge cubes of disjoint parts of data, like months, into the cube of all parts. Metrics are summed, which is exact
+     for size, count and sum.
+
+    :param list cubes: Cubes aggregated over the same dimensions and metrics
+    :param list dims: Dimensions of cubes
+    :return: Aggregated data
+    :rtype: pd.DataFrame
+    """
+    df = pd.concat(cubes, ignore_index=True)
+    if len(dims) == 0:
+        return pd.DataFrame({name: [df[name].sum()] for name in df.columns})
+    return df.groupby(dims, dropna=False) \
+        .sum() \
+        .reset_index(drop=False)
+
+
+def to_store(cube, labels=None):
+    """
+    Encode cube as columns of plain lists to ship in a dcc.Store. Text columns are dictionary encoded with sorted labels,
+     columns given in labels keep their codes and ship the label mapping instead. Missing values of both are -1.
+
+    :param pd.DataFrame cube: Aggregated data
+    :param dict labels: Code to label mappings of coded columns
+    :return: Columnar cube
+    :rtype: dict
+    """
+    labels = {name: {str(k): v for k, v in mapping.items()} for name, mapping in (labels or {}).items()}
+    columns = {}
+    for name in cube.columns:
+        col = cube[name]
+        if col.dtype == object:
+            codes, uniques = pd.factorize(col, sort=True)
+            columns[name] = codes.tolist()
+            labels[name] = {str(k): v for k, v in enumerate(uniques)}
+        elif name in labels:
+            columns[name] = col.fillna(-1).astype('int64').tolist()
+        else:
+            columns[name] = col.tolist()
+
+    return {
+        'length': len(cube),
+        'columns': columns,
+        'labels': labels,
+    }
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+class Dimensions:
+    """
+    Zone and borough dimension tables. Trips only carry integer zone and borough keys, names are attached to the few
+     aggregated rows a figure draws.
+    """
+    def __init__(self, zones, boroughs=None):
+        """
+        :param pd.DataFrame zones: Zones with LocationID, Borough, Zone and service_zone columns
+        :param pd.DataFrame or None boroughs: Boroughs with BoroughID and Borough columns, keys numbered from 0 in order
+         of first appearance in zones if none
+        """
+        if boroughs is None:
+            names = list(pd.unique(zones['Borough']))
+            boroughs = pd.DataFrame({'BoroughID': range(len(names)), 'Borough': names})
+        self.boroughs = boroughs.sort_values('BoroughID', ignore_index=True)
+        self.zones = zones.assign(BoroughID=pd.Categorical(zones['Borough'], categories=self.boroughs['Borough']).codes)
+        self.borough_names = self.boroughs.set_index('BoroughID')['Borough']
+        self.zone_names = self.zones.set_index('LocationID')['Zone']
+
+        # Borough key of every zone key, -1 for keys missing in zones
+        self.zone_borough = np.full(int(zones['LocationID'].max()) + 1, -1, dtype=np.int8)
+        self.zone_borough[self.zones['LocationID']] = self.zones['BoroughID']
+
+    @classmethod
+    def from_csv(cls, path='data/zones.csv'):
+        """
+        Load dimensions from taxi zone lookup file.
+
+        :param str path: Path of zones csv file
+        :return: Dimensions
+        :rtype: Dimensions
+        """
+        return cls(pd.read_csv(path))
+
+    def to_records(self):
+        """
+        Return zones and boroughs as JSON serializable records, to build dimensions from again.
+
+        :return: Zone and borough records
+        :rtype: dict
+        """
+        zones = self.zones[['LocationID', 'Borough', 'Zone', 'service_zone']]
+        return {
+            'zones': zones.astype(object).where(zones.notna(), None).to_dict('records'),
+            'boroughs': self.boroughs.astype(object).to_dict('records'),
+        }
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build dimensions from records of `to_records`.
+
+        :param dict records: Zone and borough records
+        :return: Dimensions
+        :rtype: Dimensions
+        """
+        return cls(pd.DataFrame(records['zones']), pd.DataFrame(records['boroughs']))
+
+    def encode(self, location_ids):
+        """
+        Return compact zone keys and their borough keys.
+
+        :param pd.Series location_ids: Zone ids of trips, may have missing values
+        :return: Zone keys and borough keys, missing or unknown zones get borough key -1
+        :rtype: tuple
+        """
+        keys = location_ids.fillna(0).to_numpy().astype(np.int16)
+        known = (keys >= 0) & (keys < len(self.zone_borough))
+        boroughs = np.where(known, self.zone_borough[np.where(known, keys, 0)], -1).astype(np.int8)
+        return keys, boroughs
+
+    def label(self, df, boroughs=None, zones=None):
+        """
+        Attach names to aggregated rows, rows of unknown boroughs or zones are dropped.
+
+        :param pd.DataFrame df: Aggregated data
+        :param dict boroughs: Name columns to add from borough key columns, like {'PUBorough': 'PUBoroughID'}
+        :param dict zones: Name columns to add from zone key columns, like {'PUZone': 'PULocationID'}
+        :return: Labeled data
+        :rtype: pd.DataFrame
+        """
+        df = df.copy()
+        for name, key in (boroughs or {}).items():
+            df[name] = df[key].map(self.borough_names)
+        for name, key in (zones or {}).items():
+            df[name] = df[key].map(self.zone_names)
+        return df.dropna(subset=list(boroughs or {}) + list(zones or {}))
@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+
+class ODMatrix:
+    """
+    Dense origin-destination trip counts of all zone pairs for every weekday and hour bucket. Counts are kept as
+     running sums over hours, so any hour range of any weekday is the difference of two matrices. Selections of some
+     months are summed from sparse counts of those months.
+    """
+    def __init__(self, cumulative, dimensions, segments=None):
+        """
+        :param np.ndarray cumulative: Trip counts summed over hours, shaped (weekday, hour + 1, origin, destination)
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param dict or None segments: Sparse trip counts by (year, month), as bucket offsets, zone pairs and counts
+        """
+        self.cumulative = cumulative
+        self.segments = segments or {}
+        self.size = cumulative.shape[-1]
+        self.boroughs = list(dimensions.borough_names)
+
+        # Zone keys index matrices directly, borough nodes follow the last zone key
+        self.zone_borough = dimensions.zone_borough.astype(np.int64)
+        self.membership = np.zeros((self.size, len(self.boroughs)))
+        valid = self.zone_borough >= 0
+        self.membership[np.flatnonzero(valid), self.zone_borough[valid]] = 1
+
+        self.labels = list(dimensions.zone_names.reindex(range(self.size)).fillna('')) + self.boroughs
+
+    @classmethod
+    def from_frame(cls, df, dimensions, weights=None):
+        """
+        Count trips of data by weekday, hour, pick up and drop off zone.
+
+        :param pd.DataFrame df: Data or aggregated data with weekday, hour, PULocationID and DOLocationID columns, and
+         optionally year and month columns to select months
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param str or None weights: Column of trip counts when data is aggregated, one trip per row if none
+        :return: Origin-destination matrices
+        :rtype: ODMatrix
+        """
+        size = len(dimensions.zone_borough)
+        pu = df['PULocationID'].fillna(0).to_numpy().astype(np.int64)
+        do = df['DOLocationID'].fillna(0).to_numpy().astype(np.int64)
+        valid = (pu > 0) & (pu < size) & (do > 0) & (do < size)
+        bucket = df['weekday'].to_numpy()[valid].astype(np.int64) * 24 + df['hour'].to_numpy()[valid]
+        pair = pu[valid] * size + do[valid]
+        trips = df[weights].to_numpy()[valid] if weights is not None else np.ones(len(pair))
+        counts = np.bincount(bucket * size * size + pair, weights=trips, minlength=7 * 24 * size * size)
+        counts = counts.astype(np.uint32).reshape(7, 24, size, size)
+
+        segments = {}
+        if 'year' in df.columns and 'month' in df.columns:
+            # Sorted by month and bucket, trips of a month and weekday are one slice over an hour range
+            key = df['year'].to_numpy()[valid].astype(np.int64) * 100 + df['month'].to_numpy()[valid]
+            order = np.lexsort((bucket, key))
+            months, starts = np.unique(key[order], return_index=True)
+            for month, start, end in zip(months, starts, np.append(starts[1:], len(order))):
+                rows = order[start:end]
+                segments[divmod(int(month), 100)] = (
+                    np.searchsorted(bucket[rows], np.arange(7 * 24 + 1)),
+                    pair[rows].astype(np.int32),
+                    trips[rows].astype(np.uint32),
+                )
+
+        return cls(cls.accumulate(counts), dimensions, segments)
+
+    @classmethod
+    def from_arrays(cls, arrays, dimensions):
+        """
+        Restore matrices from arrays of `to_arrays`, arrays are used as they are so they may be memory-mapped.
+
+        :param dict arrays: Arrays by name
+        :param Dimensions dimensions: Zone and borough dimensions
+        :return: Origin-destination matrices
+        :rtype: ODMatrix
+        """
+        bounds = arrays['bounds']
+        segments = {
+            (int(year), int(month)): (
+                arrays['offsets'][i],
+                arrays['pairs'][bounds[i]:bounds[i + 1]],
+                arrays['trips'][bounds[i]:bounds[i + 1]],
+            ) for i, (year, month) in enumerate(arrays['months'])
+        }
+        return cls(arrays['cumulative'], dimensions, segments)
+
+    def to_arrays(self):
+        """
+        Return matrices and sparse month counts as arrays, sparse counts of months are concatenated.
+
+        :return: Arrays by name
+        :rtype: dict
+        """
+        months = list(self.segments)
+        return {
+            'cumulative': self.cumulative,
+            'months': np.array(months, dtype=np.int64).reshape(-1, 2),
+            'offsets': np.array([self.segments[m][0] for m in months], dtype=np.int64).reshape(-1, 7 * 24 + 1),
+            'bounds': np.cumsum([0] + [len(self.segments[m][1]) for m in months]),
+            'pairs': np.concatenate([self.segments[m][1] for m in months] + [np.array([], dtype=np.int32)]),
+            'trips': np.concatenate([self.segments[m][2] for m in months] + [np.array([], dtype=np.uint32)]),
+        }
+
+    @staticmethod
+    def accumulate(counts):
+        """
+        Turn counts per hour into running sums over hours with a leading zero hour.
+
+        :param np.ndarray counts: Trip counts shaped (weekday, hour, origin, destination)
+        :return: Running sums shaped (weekday, hour + 1, origin, destination)
+        :rtype: np.ndarray
+        """
+        cumulative = np.zeros((counts.shape[0], counts.shape[1] + 1) + counts.shape[2:], dtype=np.uint32)
+        np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+        return cumulative
+
+    def select(self, hours, days, months=None):
+        """
+        Return zone to zone trip counts of given hours range, days and months.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Trip counts shaped (origin, destination)
+        :rtype: np.ndarray
+        """
+        if months is not None and len(self.segments) > 0 and not set(self.segments) <= set(map(tuple, months)):
+            pairs, trips = [], []
+            for month in months:
+                if tuple(month) not in self.segments:
+                    continue
+                offsets, pair, counts = self.segments[tuple(month)]
+                for day in days:
+                    rows = slice(offsets[day * 24 + min(hours)], offsets[day * 24 + max(hours) + 1])
+                    pairs.append(pair[rows])
+                    trips.append(counts[rows])
+            counts = np.bincount(
+                np.concatenate(pairs + [np.array([], dtype=np.int32)]),
+                weights=np.concatenate(trips + [np.array([], dtype=np.uint32)]),
+                minlength=self.size * self.size
+            )
+            return counts.astype(np.int64).reshape(self.size, self.size)
+
+        days = list(days)
+        upper = self.cumulative[days, max(hours) + 1]
+        lower = self.cumulative[days, min(hours)]
+        return (upper - lower).sum(axis=0, dtype=np.int64)
+
+    def borough_matrix(self, hours, days, months=None):
+        """
+        Return borough to borough trip counts of given hours range, days and months.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Trip counts shaped (origin borough, destination borough)
+        :rtype: pd.DataFrame
+        """
+        counts = self.membership.T @ self.select(hours, days, months) @ self.membership
+        return pd.DataFrame(counts.astype(np.int64), index=self.boroughs, columns=self.boroughs)
+
+    def top_flows(self, hours, days, n=10, months=None):
+        """
+        Return zone pairs with the most trips in given hours range, days and months.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param int n: Number of zone pairs
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Pick up zone, drop off zone and trip counts
+        :rtype: pd.DataFrame
+        """
+        counts = self.select(hours, days, months).ravel()
+        n = min(n, np.count_nonzero(counts))
+        top = np.argpartition(counts, -n)[-n:] if n > 0 else np.array([], dtype=np.int64)
+        top = top[np.argsort(counts[top])[::-1]]
+        pu, do = np.divmod(top, self.size)
+        return pd.DataFrame({
+            'PULocationID': pu,
+            'DOLocationID': do,
+            'PUZone': [self.labels[i] for i in pu],
+            'DOZone': [self.labels[i] for i in do],
+            'value': counts[top],
+        })
+
+    def sankey_links(self, hours, days, borough, months=None):
+        """
+        Return links from given pick up borough to every other drop off borough, and from each of those boroughs to
+         their drop off zones. Nodes are zone keys, followed by borough keys.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param str borough: Pick up borough
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Source nodes, target nodes and trip counts
+        :rtype: tuple
+        """
+        if borough not in self.boroughs:
+            return [], [], []
+        b = self.boroughs.index(borough)
+        to_zones = self.membership[:, b] @ self.select(hours, days, months)
+        to_zones[self.zone_borough == b] = 0
+        to_boroughs = to_zones @ self.membership
+
+        boroughs = np.flatnonzero(to_boroughs)
+        zones = np.flatnonzero(to_zones)
+        source = [self.size + b] * len(boroughs) + (self.size + self.zone_borough[zones]).tolist()
+        target = (self.size + boroughs).tolist() + zones.tolist()
+        value = to_boroughs[boroughs].round().astype(np.int64).tolist() \
+            + to_zones[zones].round().astype(np.int64).tolist()
+        return source, target, value
@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class LogBins:
+    """
+    Logarithmic bins of a quantile sketch with relative accuracy alpha, like DDSketch. Bin 0 holds values up to
+     min_value, bin k holds values in (min_value * gamma^(k - 1), min_value * gamma^k] and the last bin also holds
+     every value above max_value.
+    """
+    def __init__(self, alpha=0.01, min_value=0.01, max_value=100000):
+        """
+        :param float alpha: Relative accuracy of quantiles
+        :param float min_value: Largest value of first bin
+        :param float max_value: Smallest value of last bin
+        """
+        self.alpha = alpha
+        self.min_value = min_value
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.size = int(np.ceil(np.log(max_value / min_value) / np.log(self.gamma))) + 1
+
+        # Value every bin stands for, which is within alpha of all values in the bin
+        self.values = np.concatenate([
+            [0.0],
+            2 * min_value * self.gamma ** np.arange(1, self.size) / (self.gamma + 1),
+        ])
+
+    def index(self, values):
+        """
+        Return bins of given values.
+
+        :param np.ndarray values: Values without missing values
+        :return: Bin indexes
+        :rtype: np.ndarray
+        """
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bins = np.ceil(np.log(values / self.min_value) / np.log(self.gamma))
+        bins = np.where(values <= self.min_value, 0, np.clip(bins, 0, self.size - 1))
+        return bins.astype(np.int64)
+
+    def sql(self, column):
+        """
+        Return SQL expression computing bins of given column, same as `index`.
+
+        :param str column: Quoted column name
+        :return: SQL expression
+        :rtype: str
+        """
+        bins = f'ceil(ln({column} / {self.min_value}) / ln({self.gamma}))'
+        return f'CASE WHEN {column} <= {self.min_value} THEN 0 ' \
+               f'ELSE CAST(least({bins}, {self.size - 1}) AS BIGINT) END'
+
+
+class QuantileSketches:
+    """
+    Mergeable quantile sketches of a column for every month, weekday and hour bucket. A sketch is a count per
+     logarithmic bin, so merging sketches of any filter is summing their counts.
+    """
+    def __init__(self, counts, bins, months):
+        """
+        :param np.ndarray counts: Counts shaped (month, weekday, hour, bin)
+        :param LogBins bins: Bins of counts
+        :param list months: (year, month) pairs of counts
+        """
+        self.counts = counts
+        self.bins = bins
+        self.months = list(months)
+        self.totals = counts.sum(axis=0, dtype=np.int64)
+
+    @classmethod
+    def from_histogram(cls, df, bins, months):
+        """
+        Build sketches from binned counts.
+
+        :param pd.DataFrame df: Counts with year, month, weekday, hour, bin and count columns, from `Backend.histogram`
+        :param LogBins bins: Bins of counts
+        :param list months: Sorted (year, month) pairs of data
+        :return: Quantile sketches
+        :rtype: QuantileSketches
+        """
+        keys = np.array([year * 100 + month for year, month in months], dtype=np.int64)
+        month = np.searchsorted(keys, df['year'].to_numpy().astype(np.int64) * 100 + df['month'].to_numpy())
+        flat = ((month * 7 + df['weekday'].to_numpy()) * 24 + df['hour'].to_numpy()) * bins.size + df['bin'].to_numpy()
+        counts = np.bincount(flat, weights=df['count'].to_numpy(), minlength=len(months) * 7 * 24 * bins.size)
+        return cls(counts.astype(np.int32).reshape(len(months), 7, 24, bins.size), bins, months)
+
+    def merge(self, hours, days, months=None):
+        """
+        Merge sketches of given hours range, days and months.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Counts per bin
+        :rtype: np.ndarray
+        """
+        hours = slice(min(hours), max(hours) + 1)
+        if months is None:
+            return self.totals[list(days), hours].sum(axis=(0, 1))
+        months = set(map(tuple, months))
+        positions = [i for i, month in enumerate(self.months) if month in months]
+        return self.counts[positions][:, list(days), hours].sum(axis=(0, 1, 2), dtype=np.int64)
+
+    def quantiles(self, hours, days, qs=(0.5, 0.9), months=None):
+        """
+        Return approximate quantiles of given hours range, days and months, none if there are no values.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param tuple qs: Quantiles to return, between 0 and 1
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Quantiles
+        :rtype: list
+        """
+        cumulative = np.cumsum(self.merge(hours, days, months))
+        total = cumulative[-1]
+        if total == 0:
+            return [None for _ in qs]
+        ranks = np.asarray(qs) * (total - 1)
+        return self.bins.values[np.searchsorted(cumulative, ranks, side='right')].tolist()
+
+    def distribution(self, hours, days, months=None):
+        """
+        Return counts of non-empty bins of given hours range, days and months.
+
+        :param tuple hours: Selected hours range
+        :param tuple days: Selected days
+        :param tuple or None months: Selected (year, month) pairs, all months if none
+        :return: Bin values and counts
+        :rtype: tuple
+        """
+        counts = self.merge(hours, days, months)
+        nonzero = np.flatnonzero(counts)
+        return self.bins.values[nonzero], counts[nonzero]
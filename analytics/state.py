@@ -0,0 +1,159 @@
+import pandas as pd
+from analytics.artifacts import Artifacts
+from analytics.backend import PandasBackend
+from analytics.dimensions import Dimensions
+from analytics.od import ODMatrix
+from analytics.sketch import LogBins, QuantileSketches
+from util.figure import FigureCache
+
+# Metrics of kpi cards, also shipped in the cube
+kpi_metrics = {
+    'trips': ('hour', 'size'),
+    'trip_distance': ('trip_distance', 'sum'),
+    'total_amount': ('total_amount', 'sum'),
+    'passenger_count': ('passenger_count', 'sum'),
+}
+
+
+class DashboardState:
+    """
+    State derived once from data for the dashboard: months, totals, origin-destination matrices, quantile sketches,
+     pick up boroughs, cached figures and the clientside cube. It is computed from a backend, or loaded from a version of
+     artifacts and then served entirely from that version.
+    """
+    def __init__(self, dimensions, backend, months, totals, od, sketches, boroughs, figure_cache, cube=None):
+        """
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param Backend backend: Backend of filtered queries
+        :param list months: Sorted (year, month) pairs of data
+        :param pd.Series totals: Kpi metrics of all data
+        :param ODMatrix od: Origin-destination matrices
+        :param dict sketches: Quantile sketches by column
+        :param list boroughs: Pick up boroughs of data
+        :param FigureCache figure_cache: Cache of figures and components
+        :param dict or None cube: Clientside cube, built on first use if none
+        """
+        self.dimensions = dimensions
+        self.backend = backend
+        self.months = months
+        self.totals = totals
+        self.od = od
+        self.sketches = sketches
+        self.boroughs = boroughs
+        self.figure_cache = figure_cache
+        self.cube = cube
+
+    @classmethod
+    def compute(cls, dimensions, backend, sketch_accuracy=0.01, figure_cache_size=256):
+        """
+        Compute state from data of backend.
+
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param Backend backend: Backend of data
+        :param float sketch_accuracy: Relative accuracy of quantile sketches
+        :param int figure_cache_size: Size of figure cache
+        :return: State
+        :rtype: DashboardState
+        """
+        months = list(backend.months)
+        od = ODMatrix.from_frame(
+            backend.aggregate(
+                ['year', 'month', 'weekday', 'hour', 'PULocationID', 'DOLocationID'],
+                {'trips': ('hour', 'size')}
+            ),
+            dimensions,
+            weights='trips'
+        )
+        bins = LogBins(alpha=sketch_accuracy)
+        sketches = {
+            column: QuantileSketches.from_histogram(backend.histogram(column, bins), bins, months)
+            for column in ['trip_time', 'fare_amount', 'trip_distance']
+        }
+        gp = backend.aggregate(['PUBoroughID'], {'trips': ('hour', 'size')})
+        boroughs = list(dimensions.label(gp, boroughs={'PUBorough': 'PUBoroughID'})['PUBorough'])
+
+        return cls(
+            dimensions=dimensions,
+            backend=backend,
+            months=months,
+            totals=backend.aggregate([], kpi_metrics).iloc[0],
+            od=od,
+            sketches=sketches,
+            boroughs=boroughs,
+            figure_cache=FigureCache(size=figure_cache_size),
+        )
+
+    @classmethod
+    def load(cls, artifacts, figure_cache_size=256):
+        """
+        Load state from artifacts. Only versions built with pandas backend hold trips to serve queries from.
+
+        :param Artifacts artifacts: Version of artifacts
+        :param int figure_cache_size: Size of figure cache
+        :return: State
+        :rtype: DashboardState
+        """
+        metadata = artifacts.metadata
+        if metadata.get('backend') != 'pandas':
+            raise Exception(f'Artifacts "{artifacts.path}" are not built with pandas backend and hold no trips, '
+                            f'rebuild them with pandas backend')
+        if 'dimensions' in artifacts.manifest['documents']:
+            dimensions = Dimensions.from_records(artifacts.document('dimensions'))
+        else:
+            dimensions = Dimensions.from_csv(artifacts.file('zones.csv'))
+        months = [tuple(month) for month in metadata['months']]
+        bins = LogBins(alpha=metadata['sketch_accuracy'])
+        figure_cache = FigureCache(size=figure_cache_size)
+        figure_cache.load(artifacts.document('figures'))
+
+        return cls(
+            dimensions=dimensions,
+            backend=PandasBackend(artifacts.frame('trips')),
+            months=months,
+            totals=pd.Series(metadata['totals']),
+            od=ODMatrix.from_arrays(artifacts.arrays('od'), dimensions),
+            sketches={
+                column: QuantileSketches(counts, bins, months)
+                for column, counts in artifacts.arrays('sketches').items()
+            },
+            boroughs=metadata['boroughs'],
+            figure_cache=figure_cache,
+            cube=artifacts.document('cube'),
+        )
+
+    def write(self, root, version):
+        """
+        Write state as a new version of artifacts under root. Trips are written with the state, so it needs data of
+         pandas backend.
+
+        :param str root: Root directory of versions
+        :param str version: Version, like build time
+        :return: Written artifacts
+        :rtype: Artifacts
+        """
+        if not isinstance(self.backend, PandasBackend):
+            raise Exception('Artifacts hold trips of pandas backend, build them with pandas backend')
+        if self.cube is None:
+            raise Exception('Cube of state is not built')
+
+        arrays = {f'od/{name}': values for name, values in self.od.to_arrays().items()}
+        arrays.update({f'sketches/{column}': sketch.counts for column, sketch in self.sketches.items()})
+        arrays.update({f'trips/{column}': self.backend.df[column].to_numpy() for column in self.backend.df.columns})
+
+        return Artifacts.write(
+            root=root,
+            version=version,
+            arrays=arrays,
+            documents={
+                'figures': self.figure_cache.dump(),
+                'cube': self.cube,
+                'dimensions': self.dimensions.to_records(),
+            },
+            metadata={
+                'backend': 'pandas',
+                'months': [list(month) for month in self.months],
+                'totals': {name: float(value) for name, value in self.totals.items()},
+                'boroughs': self.boroughs,
+                'sketch_accuracy': next(iter(self.sketches.values())).bins.alpha,
+            },
+        )
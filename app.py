@@ -2,27 +2,58 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from dash.dependencies import Input, Output
+from analytics import Artifacts, DashboardState, Dimensions, DuckDBBackend, PandasBackend, kpi_metrics
+from dash.dependencies import ClientsideFunction, Input, Output
 from db.operations import Operations
+from figures import all_days, draw_bar, draw_sankey, draw_sunburst_do, draw_sunburst_pu, draw_trip_time, \
+    gdraw_line1, gdraw_line2, get_cube, get_figure
+from util.config import config
 
 
-app = dash.Dash(external_stylesheets=[dbc.themes.SLATE])
+app = dash.Dash(external_stylesheets=[dbc.themes.SLATE], compress=config.dashboard.compress)
 
-zones = pd.read_csv('data/zones.csv')
-op = Operations
-data = op.get_main_data(zones=zones)
-initial_length = len(data)
+# Derived state is loaded from a version built by build_artifacts.py and served entirely from it, or computed here if
+# no version is set
+if config.artifacts.version:
+    if config.dashboard.backend == 'duckdb':
+        raise Exception('Artifacts are served with pandas backend, set dashboard backend to pandas or unset version')
+    state = DashboardState.load(
+        Artifacts.open(config.artifacts.root, config.artifacts.version),
+        figure_cache_size=config.dashboard.figure_cache_size,
+    )
+else:
+    op = Operations
+    # Dimensions of db data are read from its dimension tables
+    dimensions = op.get_dimensions() if config.dashboard.backend == 'pandas' and config.dashboard.source == 'db' \
+        else Dimensions.from_csv()
+    if config.dashboard.backend == 'duckdb':
+        backend = DuckDBBackend(
+            root=config.parquet.root,
+            dimensions=dimensions,
+            threads=config.dashboard.threads,
+            memory_limit=config.dashboard.memory_limit,
+        )
+    else:
+        backend = PandasBackend(op.get_main_data(
+            dimensions=dimensions,
+            root=config.parquet.root if config.dashboard.source == 'parquet' else None,
+        ))
+    state = DashboardState.compute(
+        dimensions=dimensions,
+        backend=backend,
+        sketch_accuracy=config.dashboard.sketch_accuracy,
+        figure_cache_size=config.dashboard.figure_cache_size,
+    )
+months = state.months
+initial_length = int(state.totals['trips'])
 
 
-def get_loader(df=data):
+def get_loader(trips=initial_length):
     """
     This function generates a loading bar that shows the current data you are working with and
      its proportion to all data.
 
-    :param df: Initial data
+    :param trips: Number of selected trips
     :return: Loading bar for data used
     :rtype: dcc.Loading
     """
@@ -31,8 +62,8 @@ def get_loader(df=data):
         id='loading',
         type='default',
         children=[
-            dcc.Markdown(id='data_summary_filtered', children=f'{len(df):,d} taxi trips selected'),
-            html.Progress(id='selected_progress', max=f'{initial_length}', value=f'{len(df)}'),
+            dcc.Markdown(id='data_summary_filtered', children=f'{trips:,d} taxi trips selected'),
+            html.Progress(id='selected_progress', max=f'{initial_length}', value=f'{trips}'),
         ]
     )
 
@@ -53,6 +84,23 @@ def get_slider():
     )
 
 
+def get_month_slider():
+    """
+    Slider to filter months in data, by year and month partitions.
+
+    :return: Slider filter
+    :rtype: dcc.RangeSlider
+    """
+    return dcc.RangeSlider(
+        id='months',
+        value=[0, max(len(months) - 1, 0)],
+        min=0,
+        max=max(len(months) - 1, 0),
+        step=1,
+        marks={i: f'{year}-{month:02d}' for i, (year, month) in enumerate(months) if month % 3 == 1}
+    )
+
+
 def get_dropdown():
     """
     Dropdown list to select days to filter data.
@@ -77,296 +125,340 @@ def get_dropdown():
     )
 
 
-def draw_sunburst_pu(df=data):
+def sankey_dropdown():
     """
-    Sunburst chart for pick up boroughs.
+    Dropdown list to select pick up borough of sankey diagram.
 
-    :param df: Initial data
-    :return: Sunburst chart
-    :rtype: go.Figure
+    :return: Dropdown filter
+    :rtype: dcc.Dropdown
     """
-    gp = df.groupby(['PUBorough', 'PUZone']) \
-        .agg(value=('VendorID', 'count')) \
-        .reset_index(drop=False)
-
-    return px.sunburst(gp, path=['PUBorough', 'PUZone'], values='value') \
-        .update_layout(
-        template='plotly_dark',
-        plot_bgcolor='rgba(0, 0, 0, 0)',
-        paper_bgcolor='rgba(0, 0, 0, 0)',
+    options = []
+    for b in state.boroughs:
+        options.append({'label': b, 'value': b})
+    return dcc.Dropdown(
+        id='borough',
+        placeholder='Select a pick up borough',
+        options=options,
+        value='Manhattan',
+        multi=False
     )
 
 
-def draw_sunburst_do(df=data):
+def kpi_card1(summary=state.totals):
     """
-    Sunburst chart for drop off boroughs.
+    Return a kpi card that shows total trip count.
 
-    :param df: Initial data
-    :return: Sunburst chart
-    :rtype: go.Figure
+    :param summary: Totals of selected trips
+    :return: Kpi card
+    :rtype: dbc.Card
     """
-    gp = df.groupby(['DOBorough', 'DOZone']) \
-        .agg(value=('VendorID', 'count')) \
-        .reset_index(drop=False)
-
-    return px.sunburst(gp, path=['DOBorough', 'DOZone'], values='value') \
-        .update_layout(
-        template='plotly_dark',
-        plot_bgcolor='rgba(0, 0, 0, 0)',
-        paper_bgcolor='rgba(0, 0, 0, 0)',
-    )
+    total = summary['trips']
+    return [
+        html.H4('Total Trips', className='card-title'),
+        html.P(f'{int(total):,d}', className='card-value'),
+    ]
 
 
-def draw_sankey(df=data, boro='Manhattan'):
+def kpi_card2(summary=state.totals):
     """
-    Return a sankey diagram that takes given pick up borough as source and every other borough except itself as drop off
-     destination, and then takes each drop off borough as source to all zones of said boroughs.
+    Return a kpi card that shows total trip distance.
 
-    :param boro: Pick up borough to select as source
-    :param df: Initial data
-    :return: Sankey diagram
-    :rtype: go.Figure
+    :param summary: Totals of selected trips
+    :return: Kpi card
+    :rtype: dbc.Card
     """
-    boro_filtered = df[
-        (df['PUBorough'] == boro)
-        & (df['DOBorough'] != boro)
+    total = round(summary['trip_distance'])
+    return [
+        html.H4('Total Trip Distance', className='card-title'),
+        html.P(f'{int(total):,d}', className='card-value'),
     ]
-    sk = boro_filtered \
-        .groupby(['PUBorough', 'DOBorough']) \
-        .agg(value=('VendorID', 'count')) \
-        .reset_index(drop=False)
-    zd = {
-        'EWR': 266,
-        'Queens': 267,
-        'Bronx': 268,
-        'Manhattan': 269,
-        'Staten Island': 270,
-        'Brooklyn': 271,
-        'Unknown': 272
-    }
-    sk['PUBorough'] = sk['PUBorough'].replace(zd)
-    sk['DOBorough'] = sk['DOBorough'].replace(zd)
-
-    sk2 = boro_filtered \
-        .groupby(['DOBorough', 'DOZone']) \
-        .agg(value=('VendorID', 'count')) \
-        .reset_index(drop=False)
-    zd2 = zones.set_index('DOZone')['DOLocationID'].to_dict()
-    sk2['DOBorough'] = sk2['DOBorough'].replace(zd)
-    sk2['DOZone'] = sk2['DOZone'].replace(zd2)
-
-    return go.Figure(
-                data=[go.Sankey(
-                    node=dict(
-                        pad=15,
-                        thickness=20,
-                        line=dict(
-                            width=0.5,
-                            color='rgba(255, 0, 255, 0.65)'
-                        ),
-                        label=[''] + list(zones['DOZone']) + list(zd.keys())
-                    ),
-                    link=dict(
-                        source=list(sk.T.loc['PUBorough', :]) + list(sk2.T.loc['DOBorough', :]),
-                        target=list(sk.T.loc['DOBorough', :]) + list(sk2.T.loc['DOZone', :]),
-                        value=list(sk.T.loc['value', :]) + list(sk2.T.loc['value', :])
-                    )
-                )]
-            ).update_layout(
-                template='plotly_dark',
-                plot_bgcolor='rgba(0, 0, 0, 0)',
-                paper_bgcolor='rgba(0, 0, 0, 0)',
-            )
 
 
-def sankey_dropdown(df=data):
+def kpi_card3(summary=state.totals):
     """
-    Dropdown list to select days to filter data.
+    Return a kpi card that shows total amount spent for taxi rides.
 
-    :param df: Initial data to get borough options for dropdown list
-    :return: Dropdown filter
-    :rtype: dcc.Dropdown
+    :param summary: Totals of selected trips
+    :return: Kpi card
+    :rtype: dbc.Card
     """
-    options = []
-    for b in df.PUBorough.unique():
-        options.append({'label': b, 'value': b})
-    return dcc.Dropdown(
-        id='borough',
-        placeholder='Select a pick up borough',
-        options=options,
-        value='Manhattan',
-        multi=False
-    )
+    total = round(summary['total_amount'])
+    return [
+        html.H4('Total Trip Payment Amount', className='card-title'),
+        html.P(f'{int(total):,d}', className='card-value'),
+    ]
 
 
-def gdraw_line1(df=data):
+def kpi_card4(summary=state.totals):
     """
-    Return a line chart that shows total trip counts by pick up borough for weekdays.
+    Return a kpi card that shows total passenger count.
 
-    :param df: Initial data
-    :return: Line chart
-    :rtype: go.Figure
+    :param summary: Totals of selected trips
+    :return: Kpi card
+    :rtype: dbc.Card
     """
-    gr = df.groupby(['PUBorough', 'weekday'])\
-        .agg(trip_counts=('VendorID', 'count'))\
-        .reset_index(drop=False)
-    return px.line(gr, x='weekday', y='trip_counts', color='PUBorough')\
-        .update_layout(
-            template='plotly_dark',
-            plot_bgcolor='rgba(0, 0, 0, 0)',
-            paper_bgcolor='rgba(0, 0, 0, 0)',
-        )
+    total = round(summary['passenger_count'])
+    return [
+        html.H4('Total Passenger Amount', className='card-title'),
+        html.P(f'{int(total):,d}', className='card-value'),
+    ]
 
 
-def gdraw_line2(df=data):
+def get_percentiles(hours=(0, 23), days=all_days, months=None):
     """
-    Return a line chart that shows total trip counts by drop off borough for weekdays.
+    Return median and 90th percentile of trip time, fare and distance, merged from sketches of selected hours and days.
 
-    :param df: Initial data
-    :return: Line chart
-    :rtype: go.Figure
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Median and 90th percentile by column
+    :rtype: dict
     """
-    gr = df.groupby(['DOBorough', 'weekday'])\
-        .agg(trip_counts=('VendorID', 'count'))\
-        .reset_index(drop=False)
-    return px.line(gr, x='weekday', y='trip_counts', color='DOBorough')\
-        .update_layout(
-            template='plotly_dark',
-            plot_bgcolor='rgba(0, 0, 0, 0)',
-            paper_bgcolor='rgba(0, 0, 0, 0)',
-        )
+    return {
+        column: sketch.quantiles(hours, days, qs=(0.5, 0.9), months=months) for column, sketch in state.sketches.items()
+    }
 
 
-def draw_bar(df=data):
+def format_percentiles(values):
     """
-    Return a bar chart that shows total amount paid for taxi rides by payment type for weekdays.
+    Format median and 90th percentile for kpi cards.
 
-    :param df: Initial data
-    :return: Bar chart
-    :rtype: go.Figure
+    :param list values: Median and 90th percentile
+    :return: Formatted percentiles
+    :rtype: str
     """
-    pt = {
-        1: 'Credit card',
-        2: 'Cash',
-        3: 'No charge',
-        4: 'Dispute',
-        5: 'Unknown',
-        6: 'Voided trip',
-    }
-    df['payment_type'] = df['payment_type'].replace(pt)
-    gr = df.groupby(['payment_type', 'weekday']) \
-        .agg(total_amount=('total_amount', 'sum')) \
-        .reset_index(drop=False)
-    return px.bar(gr, x='weekday', y='total_amount', color='payment_type', barmode='group') \
-        .update_layout(
-        template='plotly_dark',
-        plot_bgcolor='rgba(0, 0, 0, 0)',
-        paper_bgcolor='rgba(0, 0, 0, 0)',
-    )
+    return ' / '.join('-' if v is None else f'{v:,.1f}' for v in values)
 
 
-def kpi_card1(df=data):
+def kpi_card5(percentiles=get_percentiles()):
     """
-    Return a kpi card that shows total trip count.
+    Return a kpi card that shows median and 90th percentile of trip time.
 
-    :param df: Data to calculate kpi
+    :param percentiles: Percentiles of selected trips
     :return: Kpi card
     :rtype: dbc.Card
     """
-    total = len(df)
     return [
-        html.H4('Total Trips', className='card-title'),
-        html.P(f'{int(total):,d}', className='card-value'),
+        html.H4('Median / P90 Trip Time (min)', className='card-title'),
+        html.P(format_percentiles(percentiles['trip_time']), className='card-value'),
     ]
 
 
-def kpi_card2(df=data):
+def kpi_card6(percentiles=get_percentiles()):
     """
-    Return a kpi card that shows total trip distance.
+    Return a kpi card that shows median and 90th percentile of fare amount.
 
-    :param df: Data to calculate kpi
+    :param percentiles: Percentiles of selected trips
     :return: Kpi card
     :rtype: dbc.Card
     """
-    total = df['trip_distance'].sum().round()
     return [
-        html.H4('Total Trip Distance', className='card-title'),
-        html.P(f'{int(total):,d}', className='card-value'),
+        html.H4('Median / P90 Fare Amount', className='card-title'),
+        html.P(format_percentiles(percentiles['fare_amount']), className='card-value'),
     ]
 
 
-def kpi_card3(df=data):
+def kpi_card7(percentiles=get_percentiles()):
     """
-    Return a kpi card that shows total amount spent for taxi rides.
+    Return a kpi card that shows median and 90th percentile of trip distance.
 
-    :param df: Data to calculate kpi
+    :param percentiles: Percentiles of selected trips
     :return: Kpi card
     :rtype: dbc.Card
     """
-    total = df['total_amount'].sum().round()
     return [
-        html.H4('Total Trip Payment Amount', className='card-title'),
-        html.P(f'{int(total):,d}', className='card-value'),
+        html.H4('Median / P90 Trip Distance', className='card-title'),
+        html.P(format_percentiles(percentiles['trip_distance']), className='card-value'),
     ]
 
 
-def kpi_card4(df=data):
+def get_summary(hours, days, months=None):
     """
-    Return a kpi card that shows total passenger count.
+    Return loading bar and kpi cards for given filter inputs from cache.
 
-    :param df: Data to calculate kpi
-    :return: Kpi card
-    :rtype: dbc.Card
+    :param tuple hours: Selected hours range
+    :param tuple days: Selected days
+    :param tuple or None months: Selected months, all months if none
+    :return: Loading bar and kpi cards
+    :rtype: tuple
     """
-    total = df['passenger_count'].sum().round()
-    return [
-        html.H4('Total Passenger Amount', className='card-title'),
-        html.P(f'{int(total):,d}', className='card-value'),
-    ]
+    def build():
+        summary = state.backend.aggregate([], kpi_metrics, hours, days, months).iloc[0]
+        return get_loader(trips=int(summary['trips'])), \
+            kpi_card1(summary=summary), \
+            kpi_card2(summary=summary), \
+            kpi_card3(summary=summary), \
+            kpi_card4(summary=summary)
 
+    return state.figure_cache.get(('summary', hours, days, months), build)
 
-@app.callback(
-    Output('loading', 'children'),
-    Output('sunburst-pu', 'figure'),
-    Output('sunburst-do', 'figure'),
-    Output('sankey-diagram', 'figure'),
-    Output('gdraw-line1', 'figure'),
-    Output('gdraw-line2', 'figure'),
-    Output('draw-bar', 'figure'),
-    Output('kpi-card1', 'children'),
-    Output('kpi-card2', 'children'),
-    Output('kpi-card3', 'children'),
-    Output('kpi-card4', 'children'),
-    Input('hours', 'value'),
-    Input('days', 'value'),
-    Input('borough', 'value')
-)
-def update_all(hours, days, borough):
-    """
-    This function updates all components(charts, diagram and kpi cards) with callback inputs hours and days.
+
+def get_distributions(hours, days, months=None):
+    """
+    Return percentile kpi cards for given filter inputs from cache.
+
+    :param tuple hours: Selected hours range
+    :param tuple days: Selected days
+    :param tuple or None months: Selected months, all months if none
+    :return: Percentile kpi cards
+    :rtype: tuple
+    """
+    def build():
+        percentiles = get_percentiles(hours, days, months)
+        return kpi_card5(percentiles=percentiles), \
+            kpi_card6(percentiles=percentiles), \
+            kpi_card7(percentiles=percentiles)
+
+    return state.figure_cache.get(('percentiles', hours, days, months), build)
+
+
+def get_inputs(hours, days, month_range=None):
+    """
+    Normalize callback inputs to hashable filter inputs. Selecting every month is the same as selecting none, so the
+     full period shares cached results.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param month_range: Selected range of month positions
+    :return: Hours range, days and months
+    :rtype: tuple
+    """
+    if days is None or len(days) == 0:
+        days = all_days
+    selected = None
+    if month_range is not None and (min(month_range) > 0 or max(month_range) < len(months) - 1):
+        selected = tuple(months[min(month_range):max(month_range) + 1])
+    return (min(hours), max(hours)), tuple(sorted(set(days))), selected
+
+
+def update_flows(hours, days, borough, month_range=None):
+    """
+    This function updates sunburst charts and sankey diagram with callback inputs hours, days, borough and months.
 
     :param hours: Selected hours range
     :param days: Selected days
     :param borough: Selected pick up borough for sankey diagram
+    :param month_range: Selected range of month positions
+    :return: Renewed figures
+    :rtype: dict
+    """
+    hours, days, selected = get_inputs(hours, days, month_range)
+
+    return get_figure(state, 'sunburst-pu', draw_sunburst_pu, hours, days, selected),\
+        get_figure(state, 'sunburst-do', draw_sunburst_do, hours, days, selected),\
+        get_figure(state, 'sankey-diagram', draw_sankey, hours, days, selected, boro=borough)
+
+
+def update_distributions(hours, days, month_range=None):
+    """
+    This function updates percentile kpi cards and trip time distribution chart with callback inputs hours, days and
+     months.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param month_range: Selected range of month positions
+    :return: Renewed components
+    :rtype: dbc.Card, go.Figure
+    """
+    hours, days, selected = get_inputs(hours, days, month_range)
+    card5, card6, card7 = get_distributions(hours, days, selected)
+
+    return card5,\
+        card6,\
+        card7,\
+        get_figure(state, 'trip-time', draw_trip_time, hours, days, selected)
+
+
+def update_all(hours, days, borough, month_range=None):
+    """
+    This function updates all components(charts, diagram and kpi cards) with callback inputs hours, days and months.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param borough: Selected pick up borough for sankey diagram
+    :param month_range: Selected range of month positions
     :return: Renewed components
     :rtype: dbc.Card, dcc.Loading, go.Figure
     """
-    if days is None or len(days) == 0:
-        days = [0, 1, 2, 3, 4, 5, 6]
-    new_data_h = data[data['hour'].between(min(hours), max(hours))]
-    new_data = new_data_h[new_data_h['weekday'].isin(days)]
-
-    return get_loader(df=new_data),\
-        draw_sunburst_pu(df=new_data),\
-        draw_sunburst_do(df=new_data),\
-        draw_sankey(df=new_data, boro=borough), \
-        gdraw_line1(df=new_data_h),\
-        gdraw_line2(df=new_data_h),\
-        draw_bar(df=new_data_h),\
-        kpi_card1(df=new_data),\
-        kpi_card2(df=new_data),\
-        kpi_card3(df=new_data),\
-        kpi_card4(df=new_data)
+    sunburst_pu, sunburst_do, sankey = update_flows(hours, days, borough, month_range)
+    card5, card6, card7, trip_time = update_distributions(hours, days, month_range)
+    hours, days, selected = get_inputs(hours, days, month_range)
+    loader, card1, card2, card3, card4 = get_summary(hours, days, selected)
+
+    return loader,\
+        sunburst_pu,\
+        sunburst_do,\
+        sankey, \
+        get_figure(state, 'gdraw-line1', gdraw_line1, hours, months=selected),\
+        get_figure(state, 'gdraw-line2', gdraw_line2, hours, months=selected),\
+        get_figure(state, 'draw-bar', draw_bar, hours, months=selected),\
+        card1,\
+        card2,\
+        card3,\
+        card4,\
+        card5,\
+        card6,\
+        card7,\
+        trip_time
+
+
+if config.dashboard.clientside:
+    # Hour and day filtered components are redrawn in the browser from the cube, see assets/cube.js
+    app.clientside_callback(
+        ClientsideFunction(namespace='cube', function_name='update'),
+        Output('loading', 'children'),
+        Output('gdraw-line1', 'figure'),
+        Output('gdraw-line2', 'figure'),
+        Output('draw-bar', 'figure'),
+        Output('kpi-card1', 'children'),
+        Output('kpi-card2', 'children'),
+        Output('kpi-card3', 'children'),
+        Output('kpi-card4', 'children'),
+        Input('hours', 'value'),
+        Input('days', 'value'),
+        Input('months', 'value'),
+        Input('cube', 'data')
+    )
+    app.callback(
+        Output('sunburst-pu', 'figure'),
+        Output('sunburst-do', 'figure'),
+        Output('sankey-diagram', 'figure'),
+        Input('hours', 'value'),
+        Input('days', 'value'),
+        Input('borough', 'value'),
+        Input('months', 'value')
+    )(update_flows)
+    app.callback(
+        Output('kpi-card5', 'children'),
+        Output('kpi-card6', 'children'),
+        Output('kpi-card7', 'children'),
+        Output('trip-time', 'figure'),
+        Input('hours', 'value'),
+        Input('days', 'value'),
+        Input('months', 'value')
+    )(update_distributions)
+else:
+    app.callback(
+        Output('loading', 'children'),
+        Output('sunburst-pu', 'figure'),
+        Output('sunburst-do', 'figure'),
+        Output('sankey-diagram', 'figure'),
+        Output('gdraw-line1', 'figure'),
+        Output('gdraw-line2', 'figure'),
+        Output('draw-bar', 'figure'),
+        Output('kpi-card1', 'children'),
+        Output('kpi-card2', 'children'),
+        Output('kpi-card3', 'children'),
+        Output('kpi-card4', 'children'),
+        Output('kpi-card5', 'children'),
+        Output('kpi-card6', 'children'),
+        Output('kpi-card7', 'children'),
+        Output('trip-time', 'figure'),
+        Input('hours', 'value'),
+        Input('days', 'value'),
+        Input('borough', 'value'),
+        Input('months', 'value')
+    )(update_all)
 
 
 # Build App
@@ -411,6 +503,21 @@ app.layout = html.Div([
                 ], width=5),
             ], align='center'),
             html.Br(),
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        dbc.Card(
+                            dbc.CardBody([
+                                html.Div(children=[
+                                    html.Label('Select months'),
+                                    get_month_slider(),
+                                    ])
+                                ])
+                            )
+                        ])
+                ], width=12),
+            ], align='center'),
+            html.Br(),
             dbc.Row([
                 dbc.Col([
                     html.Label('Sun burst chart for Pick ups'),
@@ -419,7 +526,7 @@ app.layout = html.Div([
                             dbc.CardBody([
                                 dcc.Graph(
                                     id='sunburst-pu',
-                                    figure=draw_sunburst_pu(),
+                                    figure=get_figure(state, 'sunburst-pu', draw_sunburst_pu, (0, 23)),
                                     config={
                                         'displayModeBar': False
                                     }
@@ -435,7 +542,7 @@ app.layout = html.Div([
                             dbc.CardBody([
                                 dcc.Graph(
                                     id='sunburst-do',
-                                    figure=draw_sunburst_do(),
+                                    figure=get_figure(state, 'sunburst-do', draw_sunburst_do, (0, 23)),
                                     config={
                                         'displayModeBar': False
                                     }
@@ -451,7 +558,7 @@ app.layout = html.Div([
                             dbc.CardBody([
                                 dcc.Graph(
                                     id='sankey-diagram',
-                                    figure=draw_sankey(),
+                                    figure=get_figure(state, 'sankey-diagram', draw_sankey, (0, 23), boro='Manhattan'),
                                     config={
                                         'displayModeBar': False
                                         }
@@ -511,7 +618,7 @@ app.layout = html.Div([
                             dbc.CardBody([
                                 dcc.Graph(
                                     id='gdraw-line1',
-                                    figure=gdraw_line1(),
+                                    figure=get_figure(state, 'gdraw-line1', gdraw_line1, (0, 23)),
                                     config={
                                         'displayModeBar': False
                                     }
@@ -529,7 +636,7 @@ app.layout = html.Div([
                         dbc.CardBody([
                             dcc.Graph(
                                 id='draw-bar',
-                                figure=draw_bar(),
+                                figure=get_figure(state, 'draw-bar', draw_bar, (0, 23)),
                                 config={
                                     'displayModeBar': False
                                 }
@@ -543,7 +650,7 @@ app.layout = html.Div([
                         dbc.CardBody([
                             dcc.Graph(
                                 id='gdraw-line2',
-                                figure=gdraw_line2(),
+                                figure=get_figure(state, 'gdraw-line2', gdraw_line2, (0, 23)),
                                 config={
                                     'displayModeBar': False
                                 }
@@ -551,10 +658,47 @@ app.layout = html.Div([
                         ])
                     ),
                 ], width=6)
+            ], align='center'),
+            html.Br(),
+            dbc.Row([
+                dbc.Col([
+                    html.Label('Trip percentiles'),
+                    dbc.Card(id='kpi-card5', children=[
+                        dbc.CardBody(
+                            kpi_card5()
+                            ),
+                        ]),
+                    html.Br(),
+                    dbc.Card(id='kpi-card6', children=[
+                        dbc.CardBody(
+                            kpi_card6()
+                            ),
+                        ]),
+                    html.Br(),
+                    dbc.Card(id='kpi-card7', children=[
+                        dbc.CardBody(
+                            kpi_card7()
+                            ),
+                        ]),
+                ], width=4),
+                dbc.Col([
+                    html.Label('Trip time distribution'),
+                    dbc.Card(
+                        dbc.CardBody([
+                            dcc.Graph(
+                                id='trip-time',
+                                figure=get_figure(state, 'trip-time', draw_trip_time, (0, 23)),
+                                config={
+                                    'displayModeBar': False
+                                }
+                            )
+                        ])
+                    ),
+                ], width=8)
             ], align='center')
         ]), color='dark'
-    )
-])
+    ),
+] + ([dcc.Store(id='cube', data=get_cube(state))] if config.dashboard.clientside else []))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+// Clientside callbacks that redraw hour, day and month filtered components from the pre-aggregated cube shipped by app.py
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    cube: {
+        update: function (hours, days, months, cube) {
+            if (!cube) {
+                return window.dash_clientside.no_update;
+            }
+            var minHour = Math.min.apply(null, hours);
+            var maxHour = Math.max.apply(null, hours);
+            var minMonth = Math.min.apply(null, months);
+            var maxMonth = Math.max.apply(null, months);
+            if (!days || days.length === 0) {
+                days = [0, 1, 2, 3, 4, 5, 6];
+            }
+
+            function selected(columns, i, byDay) {
+                var hour = columns.hour[i];
+                var month = columns.month[i];
+                return hour >= minHour && hour <= maxHour && month >= minMonth && month <= maxMonth &&
+                    (!byDay || days.indexOf(columns.weekday[i]) >= 0);
+            }
+
+            // Sum metric of cuboid by its dimension and weekday, skipping unknown dimension keys
+            function groupByWeekday(cuboid, dim, metric, byLabel) {
+                var columns = cuboid.columns;
+                var groups = {};
+                for (var i = 0; i < cuboid.length; i++) {
+                    var code = columns[dim][i];
+                    if (code === -1 || code === null || !selected(columns, i, false)) {
+                        continue;
+                    }
+                    groups[code] = groups[code] || {};
+                    var weekday = columns.weekday[i];
+                    groups[code][weekday] = (groups[code][weekday] || 0) + columns[metric][i];
+                }
+                var labels = cuboid.labels[dim];
+                var codes = Object.keys(groups).map(Number).sort(function (a, b) {
+                    return byLabel ? labels[String(a)].localeCompare(labels[String(b)]) : a - b;
+                });
+                return codes.map(function (code) {
+                    var weekdays = Object.keys(groups[code]).map(Number).sort(function (a, b) { return a - b; });
+                    return {
+                        name: labels[String(code)],
+                        x: weekdays,
+                        y: weekdays.map(function (w) { return groups[code][w]; })
+                    };
+                });
+            }
+
+            function figure(traces, dim, y, extra) {
+                var layout = Object.assign({}, cube.layout, {
+                    xaxis: {title: {text: 'weekday'}},
+                    yaxis: {title: {text: y}},
+                    legend: {title: {text: dim}, tracegroupgap: 0}
+                }, extra);
+                return {data: traces, layout: layout};
+            }
+
+            function line(dim) {
+                var traces = groupByWeekday(cube[dim === 'PUBorough' ? 'pu' : 'do'], dim + 'ID', 'vendor_trips', true)
+                    .map(function (g) {
+                        return {
+                            type: 'scatter', mode: 'lines', name: g.name, legendgroup: g.name, x: g.x, y: g.y,
+                            hovertemplate: dim + '=' + g.name + '<br>weekday=%{x}<br>trip_counts=%{y}<extra></extra>'
+                        };
+                    });
+                return figure(traces, dim, 'trip_counts');
+            }
+
+            function bar() {
+                var traces = groupByWeekday(cube.payment, 'payment_type', 'total_amount', false).map(function (g) {
+                    return {
+                        type: 'bar', name: g.name, legendgroup: g.name, offsetgroup: g.name, x: g.x, y: g.y,
+                        hovertemplate: 'payment_type=' + g.name + '<br>weekday=%{x}<br>total_amount=%{y}<extra></extra>'
+                    };
+                });
+                return figure(traces, 'payment_type', 'total_amount', {barmode: 'group'});
+            }
+
+            var totals = {trips: 0, trip_distance: 0, total_amount: 0, passenger_count: 0};
+            var columns = cube.pu.columns;
+            for (var i = 0; i < cube.pu.length; i++) {
+                if (selected(columns, i, true)) {
+                    for (var key in totals) {
+                        totals[key] += columns[key][i];
+                    }
+                }
+            }
+
+            function format(value) {
+                return Math.round(value).toLocaleString('en-US');
+            }
+
+            function card(title, value) {
+                return [
+                    {namespace: 'dash_html_components', type: 'H4', props: {children: title, className: 'card-title'}},
+                    {namespace: 'dash_html_components', type: 'P', props: {children: format(value), className: 'card-value'}}
+                ];
+            }
+
+            var loader = [
+                {
+                    namespace: 'dash_core_components', type: 'Markdown',
+                    props: {id: 'data_summary_filtered', children: format(totals.trips) + ' taxi trips selected'}
+                },
+                {
+                    namespace: 'dash_html_components', type: 'Progress',
+                    props: {id: 'selected_progress', max: String(cube.initial_length), value: String(totals.trips)}
+                }
+            ];
+
+            return [
+                loader,
+                line('PUBorough'),
+                line('DOBorough'),
+                bar(),
+                card('Total Trips', totals.trips),
+                card('Total Trip Distance', totals.trip_distance),
+                card('Total Trip Payment Amount', totals.total_amount),
+                card('Total Passenger Amount', totals.passenger_count)
+            ];
+        }
+    }
+});
@@ -0,0 +1,50 @@
+import argparse
+from analytics import DashboardState, Dimensions, PandasBackend
+from datetime import datetime
+from db.operations import Operations
+from figures import draw_defaults, get_cube
+from util.config import config
+
+
+def parse_args():
+    """
+    Parse arguments
+
+    :return: dict of params
+    :rtype: dict
+    """
+    parser = argparse.ArgumentParser(description='Build dashboard artifacts from data')
+    parser.add_argument('--version', help='version of artifacts, build time if not given', required=False, type=str,
+                        default=datetime.utcnow().strftime('%Y%m%dT%H%M%S'))
+
+    # _: config.ini file
+    args, _ = parser.parse_known_args()
+    return args.__dict__
+
+
+def main():
+    args = parse_args()
+
+    # Trips are served from artifacts, so they are built from data loaded like for pandas backend
+    if config.dashboard.backend != 'pandas':
+        raise Exception(f'Artifacts are built with pandas backend, not {config.dashboard.backend} backend')
+    dimensions = Operations.get_dimensions() if config.dashboard.source == 'db' else Dimensions.from_csv()
+    backend = PandasBackend(Operations.get_main_data(
+        dimensions=dimensions,
+        root=config.parquet.root if config.dashboard.source == 'parquet' else None,
+    ))
+    state = DashboardState.compute(
+        dimensions=dimensions,
+        backend=backend,
+        sketch_accuracy=config.dashboard.sketch_accuracy,
+        figure_cache_size=config.dashboard.figure_cache_size,
+    )
+    draw_defaults(state)
+    get_cube(state)
+
+    artifacts = state.write(root=config.artifacts.root, version=args.get('version'))
+    print(f'Artifacts {artifacts.version} written to {artifacts.path}')
+
+
+if __name__ == '__main__':
+    main()
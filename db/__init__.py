@@ -5,7 +5,15 @@ from sqlalchemy import create_engine
 Base = declarative_base()
 
 
-def postgres_engine(params):
+def postgres_engine(params, pool_size=None):
+    """
+    Returns SQLAlchemy engine
+
+    :param params: postgres_db config section
+    :param int or None pool_size: Number of pooled connections, SQLAlchemy default if none
+    :return: engine
+    :rtype: Engine
+    """
     host = params.host
     port = params.port
     username = params.username
@@ -13,7 +21,9 @@ def postgres_engine(params):
     db = params.db
 
     uri = f'postgresql://{username}:{password}@{host}:{port}/{db}'
-    return create_engine(uri)
+    if pool_size is None:
+        return create_engine(uri)
+    return create_engine(uri, pool_size=pool_size, max_overflow=0)
 
 
 def postgres_session(params):
@@ -1,5 +1,11 @@
+from .borough import Borough
 from .green_taxi import GreenTaxi
+from .quarantine import Quarantine
+from .zone import Zone
 
 __all__ = [
+    'Borough',
     'GreenTaxi',
+    'Quarantine',
+    'Zone',
 ]
\ No newline at end of file
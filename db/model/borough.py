@@ -0,0 +1,11 @@
+from db import Base
+from sqlalchemy import Column, SmallInteger, String
+from util.config import config
+
+
+class Borough(Base):
+    __tablename__ = 'borough'
+    __table_args__ = {'schema': config.postgres_db.schema}
+
+    BoroughID = Column('BoroughID', SmallInteger, primary_key=True)
+    Borough = Column('Borough', String(16))
@@ -1,5 +1,5 @@
 from db import Base
-from sqlalchemy import BIGINT, Column, FLOAT, Integer, String, TIMESTAMP
+from sqlalchemy import BIGINT, Column, FLOAT, Integer, SmallInteger, String, TIMESTAMP
 from util.config import config
 
 
@@ -13,8 +13,8 @@ class GreenTaxi(Base):
     lpep_dropoff_datetime = Column('lpep_dropoff_datetime', TIMESTAMP)
     store_and_fwd_flag = Column('store_and_fwd_flag', String(1))
     RatecodeID = Column('RatecodeID', Integer)
-    PULocationID = Column('PULocationID', Integer)
-    DOLocationID = Column('DOLocationID', Integer)
+    PULocationID = Column('PULocationID', SmallInteger)
+    DOLocationID = Column('DOLocationID', SmallInteger)
     passenger_count = Column('passenger_count', Integer)
     trip_distance = Column('trip_distance', FLOAT)
     fare_amount = Column('fare_amount', FLOAT)
@@ -0,0 +1,20 @@
+from db import Base
+from sqlalchemy import BIGINT, Column, FLOAT, Integer, SmallInteger, TIMESTAMP
+from util.config import config
+
+
+class Quarantine(Base):
+    __tablename__ = 'green_taxi_quarantine'
+    __table_args__ = {'schema': config.postgres_db.schema}
+
+    uid = Column('uid', BIGINT, primary_key=True)
+    reasons = Column('reasons', SmallInteger, index=True)
+    VendorID = Column('VendorID', Integer)
+    lpep_pickup_datetime = Column('lpep_pickup_datetime', TIMESTAMP)
+    lpep_dropoff_datetime = Column('lpep_dropoff_datetime', TIMESTAMP)
+    PULocationID = Column('PULocationID', SmallInteger)
+    DOLocationID = Column('DOLocationID', SmallInteger)
+    trip_distance = Column('trip_distance', FLOAT)
+    total_amount = Column('total_amount', FLOAT)
+    month = Column('month', Integer, index=True)
+    year = Column('year', Integer, index=True)
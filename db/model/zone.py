@@ -0,0 +1,13 @@
+from db import Base
+from sqlalchemy import Column, SmallInteger, String
+from util.config import config
+
+
+class Zone(Base):
+    __tablename__ = 'zone'
+    __table_args__ = {'schema': config.postgres_db.schema}
+
+    LocationID = Column('LocationID', SmallInteger, primary_key=True)
+    BoroughID = Column('BoroughID', SmallInteger, index=True)
+    Zone = Column('Zone', String(64))
+    service_zone = Column('service_zone', String(16))
@@ -1,68 +1,308 @@
+import glob
 import os
+import numpy as np
 import pandas as pd
 import requests
-from db.model import GreenTaxi
+from analytics import Dimensions
+from concurrent.futures import ThreadPoolExecutor
+from db.model import Borough, GreenTaxi, Quarantine, Zone
 from db import postgres_engine, postgres_session
-from util import cast_as
+from sqlalchemy import select
 from util.config import config
 from datetime import datetime
 
 
 class Operations:
     @staticmethod
-    def get_taxi_data(year, month):
+    def get_taxi_data(year, month, fmt='csv'):
         """
-        Get taxi data from nyc-tlc site for given year and month.
+        Get taxi data from nyc-tlc site for given year and month. Monthly files are published as parquet, older months
+         are also available as csv.
 
         :param year: Year of taxi data
         :param month: Month of taxi data
-        :return: return path of downloaded csv file
+        :param str fmt: File format, csv or parquet
+        :return: return path of downloaded file
         :rtype: str
         """
-
-        url = f'https://s3.amazonaws.com/nyc-tlc/trip+data/green_tripdata_{year}-{month}.csv'
+        if fmt == 'parquet':
+            url = f'https://d37ci6vzurychx.cloudfront.net/trip-data/green_tripdata_{year}-{month}.parquet'
+        else:
+            url = f'https://s3.amazonaws.com/nyc-tlc/trip+data/green_tripdata_{year}-{month}.csv'
         r = requests.get(url, stream=True)
-        fname = f'data/green_tripdata_{year}-{month}.csv'
-        open(fname, 'wb').write(r.content)
+        r.raise_for_status()
+        fname = f'data/green_tripdata_{year}-{month}.{fmt}'
+        with open(fname, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
 
         return fname
 
     @staticmethod
-    def get_data(page, size):
+    def arrow_schema():
         """
-        Get all data from db.
+        Arrow schema of green taxi records, named and typed after `GreenTaxi` columns.
 
-        :return: green taxi data
-        :rtype: dict
+        :return: Arrow schema
+        :rtype: pa.Schema
+        """
+        import pyarrow as pa
+
+        types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp('us')}
+        return pa.schema([(c.key, types[c.type.python_type]) for c in GreenTaxi.__table__.columns])
+
+    @staticmethod
+    def get_uids(year, month, start, n):
+        """
+        Return uids of records numbered from start in file, as digits of year, month and number, like 19017 for 7th
+         record of 2019-01.
+
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :param int start: Number of first record
+        :param int n: Number of records
+        :return: uids
+        :rtype: np.ndarray
+        """
+        num = np.arange(start, start + n, dtype=np.int64)
+        digits = np.searchsorted(10 ** np.arange(1, 19, dtype=np.int64), num, side='right') + 1
+        return int(f'{year[2:]}{month}') * 10 ** digits + num
+
+    @staticmethod
+    def read_batches(path, year, month, size=150000):
+        """
+        Read green taxi records of a parquet file as arrow record batches. Only columns of `GreenTaxi` are read and they
+         are matched by name, columns missing in the file are null. uid, month and year are added like in csv records.
+
+        :param str path: Path of parquet file
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :param int size: Number of records per batch
+        :return: Record batches
+        :rtype: Iterator[pa.RecordBatch]
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        schema = Operations.arrow_schema()
+        file = pq.ParquetFile(path)
+        columns = [name for name in schema.names if name in file.schema_arrow.names]
+
+        start = 0
+        for batch in file.iter_batches(batch_size=size, columns=columns):
+            n = batch.num_rows
+            values = {
+                'uid': pa.array(Operations.get_uids(year, month, start, n), pa.int64()),
+                'month': pa.array([int(month)] * n, pa.int64()),
+                'year': pa.array([int(year)] * n, pa.int64()),
+            }
+            arrays = []
+            for field in schema:
+                if field.name in values:
+                    arrays.append(values[field.name])
+                elif field.name in columns:
+                    # Some integer columns like payment_type are published as double
+                    arrays.append(pc.cast(batch.column(field.name), field.type, safe=False))
+                else:
+                    arrays.append(pa.nulls(n, field.type))
+            start += n
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def write_dimensions(dimensions):
+        """
+        Replace zone and borough dimension tables with given dimensions.
+
+        :param Dimensions dimensions: Zone and borough dimensions
+        """
+        engine = postgres_engine(config.postgres_db)
+        zones = dimensions.zones[['LocationID', 'BoroughID', 'Zone', 'service_zone']]
+
+        with engine.begin() as conn:
+            conn.execute(Zone.__table__.delete())
+            conn.execute(Borough.__table__.delete())
+            conn.execute(Borough.__table__.insert(), dimensions.boroughs.astype(object).to_dict('records'))
+            conn.execute(Zone.__table__.insert(), zones.astype(object).where(zones.notna(), None).to_dict('records'))
+
+    @staticmethod
+    def get_dimensions():
+        """
+        Get zone and borough dimensions from dimension tables written by `write_dimensions`.
+
+        :return: Zone and borough dimensions
+        :rtype: Dimensions
+        """
+        engine = postgres_engine(config.postgres_db)
+        try:
+            with engine.connect() as conn:
+                boroughs = pd.read_sql(select(Borough.BoroughID, Borough.Borough), conn)
+                zones = pd.read_sql(
+                    select(Zone.LocationID, Borough.Borough, Zone.Zone, Zone.service_zone)
+                    .join_from(Zone, Borough, Zone.BoroughID == Borough.BoroughID, isouter=True)
+                    .order_by(Zone.LocationID),
+                    conn
+                )
+        finally:
+            engine.dispose()
+
+        if len(zones) == 0:
+            raise Exception('Dimension tables are empty, write them with feed_data.py --create_table')
+        return Dimensions(zones, boroughs)
+
+    @staticmethod
+    def get_partitions():
+        """
+        Get year and month partitions of green taxi data in db.
+
+        :return: year and month pairs
+        :rtype: list
         """
         gt = GreenTaxi
         session = postgres_session(config.postgres_db)
-        columns = [
+        try:
+            return sorted(session.query(gt.year, gt.month).distinct().all())
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_parquet_partitions(root):
+        """
+        Get year and month partitions of green taxi data written under parquet root.
+
+        :param str root: Root directory of year=YYYY/month=MM partitions
+        :return: year and month pairs with their directories
+        :rtype: dict
+        """
+        partitions = {}
+        for path in glob.glob(os.path.join(root, 'year=*', 'month=*')):
+            year = int(os.path.basename(os.path.dirname(path)).split('=')[1])
+            month = int(os.path.basename(path).split('=')[1])
+            partitions[(year, month)] = path
+        return dict(sorted(partitions.items()))
+
+    @staticmethod
+    def data_columns():
+        """
+        Columns of green taxi data used in figures.
+
+        :return: Columns
+        :rtype: list
+        """
+        gt = GreenTaxi
+        return [
             gt.PULocationID,
             gt.DOLocationID,
             gt.lpep_pickup_datetime,
             gt.lpep_dropoff_datetime,
             gt.VendorID,
             gt.payment_type,
+            gt.fare_amount,
             gt.total_amount,
             gt.trip_distance,
             gt.passenger_count,
         ]
-        try:
-            offset = (page * size) - size
-            results = session.query(*columns).offset(offset).limit(size).all()
-            return [r._asdict() for r in results]
-        finally:
-            session.close()
 
     @staticmethod
-    def write(path, year, month):
+    def get_data(engine, year, month):
+        """
+        Get data of given year and month from db.
+
+        :param engine: Engine to take a pooled connection from
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :return: green taxi data
+        :rtype: pd.DataFrame
+        """
+        gt = GreenTaxi
+        query = select(*Operations.data_columns()).where(gt.year == year, gt.month == month)
+        with engine.connect() as conn:
+            return pd.read_sql(query, conn)
+
+    @staticmethod
+    def get_parquet_data(path):
+        """
+        Get data of a year and month partition from parquet files. Pandas metadata of files is ignored, so columns get
+         the numpy types of db data whatever wrote them, integers with missing values are floats.
+
+        :param str path: Directory of partition
+        :return: green taxi data
+        :rtype: pd.DataFrame
+        """
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=[c.key for c in Operations.data_columns()]).to_pandas(ignore_metadata=True)
+
+    @staticmethod
+    def read_csv(path, year, month):
+        """
+        Read green taxi records of a csv file, typed after `GreenTaxi` columns. uid is added like in db records.
+
+        :param str path: Path of csv file
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :return: Records without month and year
+        :rtype: pd.DataFrame
+        """
+        gt = GreenTaxi
+        types = {int: 'Int64', float: 'float64', str: 'string'}
+        # uid, month and year are not in csv
+        columns = gt.__table__.columns.keys()[1:21]
+        python_types = {c: gt.__table__.columns[c].type.python_type for c in columns}
+
+        df = pd.read_csv(
+            path,
+            header=0,
+            names=columns,
+            usecols=range(len(columns)),
+            dtype={c: types[t] for c, t in python_types.items() if t in types},
+            parse_dates=[c for c, t in python_types.items() if t is datetime],
+        )
+        df.insert(0, 'uid', Operations.get_uids(year, month, 0, len(df)))
+        return df
+
+    @staticmethod
+    def to_numpy_types(df):
+        """
+        Return records with nullable integer columns as numpy integers, or as floats where values are missing, like
+         integer columns of db and parquet sources are read.
+
+        :param pd.DataFrame df: Records
+        :return: Records of numpy types
+        :rtype: pd.DataFrame
+        """
+        return df.astype({
+            name: 'float64' if col.hasnans else 'int64'
+            for name, col in df.items() if isinstance(col.dtype, pd.Int64Dtype)
+        })
+
+    @staticmethod
+    def insert(conn, model, records):
+        """
+        Insert records to table of model.
+
+        :param conn: Connection
+        :param model: Model of table
+        :param records: pd.DataFrame or pa.RecordBatch of records
         """
-        Insert green taxi records to db, then remove csv file.
+        if len(records) == 0:
+            return
+        if isinstance(records, pd.DataFrame):
+            rows = records.astype(object).where(records.notna(), None).to_dict('records')
+        else:
+            rows = records.to_pylist()
+        conn.execute(model.__table__.insert(), rows)
+
+    @staticmethod
+    def write(path, year, month, validator=None):
+        """
+        Insert green taxi records to db, then remove csv or parquet file. Records failing validation are inserted to
+         quarantine table instead.
 
         :param str path: Path of file to write
         :param year: Year of taxi data
         :param month: Month of taxi data
+        :param Validator or None validator: Validator of records, all records are inserted if none
         """
         print(f'Start time for year:{year} and month:{month} is: {datetime.now()}')
         gt = GreenTaxi
@@ -70,73 +310,119 @@ class Operations:
         conn = engine.connect()
 
         try:
-            with open(path, 'r') as f:
-                next(f)
-                entries = []
-                for num, line in enumerate(f):
-                    header = gt.__table__.columns.keys()
-                    row = line.replace('\n', '').split(',')
-                    row = [None if len(r) == 0 else r for r in row]
-                    item = {
-                        header[0]: cast_as(f'{year[2:]}{month}{num}', int),
-                        header[1]: cast_as(row[0], int),
-                        header[2]: row[1],
-                        header[3]: row[2],
-                        header[4]: row[3],
-                        header[5]: cast_as(row[4], int),
-                        header[6]: cast_as(row[5], int),
-                        header[7]: cast_as(row[6], int),
-                        header[8]: cast_as(row[7], int),
-                        header[9]: cast_as(row[8], float),
-                        header[10]: cast_as(row[9], float),
-                        header[11]: cast_as(row[10], float),
-                        header[12]: cast_as(row[11], float),
-                        header[13]: cast_as(row[12], float),
-                        header[14]: cast_as(row[13], float),
-                        header[15]: cast_as(row[14], float),
-                        header[16]: cast_as(row[15], float),
-                        header[17]: cast_as(row[16], float),
-                        header[18]: cast_as(row[17], int),
-                        header[19]: cast_as(row[18], int),
-                        header[20]: cast_as(row[19], float),
-                        header[21]: month,
-                        header[22]: year,
-                    }
-                    entries.append(item)
-            size = 150000
-            for entry in (entries[pos:pos + size] for pos in range(0, len(entries), size)):
-                conn.execute(gt.__table__.insert(), entry)
+            if path.endswith('.parquet'):
+                # Batches go to the db as python values, without formatting and parsing text
+                batches = Operations.read_batches(path=path, year=year, month=month)
+            else:
+                df = Operations.read_csv(path=path, year=year, month=month).assign(month=int(month), year=int(year))
+                size = 150000
+                batches = (df[pos:pos + size] for pos in range(0, len(df), size))
 
+            for batch in batches:
+                if validator is not None:
+                    batch, quarantined = validator.split(batch)
+                    Operations.insert(conn, Quarantine, quarantined)
+                Operations.insert(conn, gt, batch)
         finally:
             conn.close()
             os.remove(path)
 
+        if validator is not None:
+            print(validator.report())
+
     @staticmethod
-    def get_main_data(zones):
+    def write_parquet(path, year, month, root, remove=True, validator=None):
         """
-        Get data from db, merge with zones and add some features to be used in figures.
+        Write green taxi records as parquet partition of given year and month under root, to be queried by
+         `DuckDBBackend` without the db. Records failing validation are written to the same partition under quarantine
+         root of `validation` config instead.
 
+        :param str path: Path of csv or parquet file to write
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :param str root: Root directory of partitions
+        :param bool remove: Remove source file after writing
+        :param Validator or None validator: Validator of records, all records are written if none
+        """
+        print(f'Start time of parquet for year:{year} and month:{month} is: {datetime.now()}')
+        partition = os.path.join(root, f'year={year}', f'month={month}')
+        target = os.path.join(partition, 'green_tripdata.parquet')
+        quarantined = []
+
+        try:
+            os.makedirs(partition, exist_ok=True)
+            if path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                # month and year are read from partition path
+                schema = pa.schema([f for f in Operations.arrow_schema() if f.name not in ['month', 'year']])
+                with pq.ParquetWriter(target, schema) as writer:
+                    for batch in Operations.read_batches(path=path, year=year, month=month):
+                        if validator is not None:
+                            batch, invalid = validator.split(batch)
+                            quarantined.append(invalid.to_pandas())
+                        writer.write_table(pa.Table.from_batches([batch]).select(schema.names))
+            else:
+                df = Operations.read_csv(path=path, year=year, month=month)
+                if validator is not None:
+                    df, invalid = validator.split(df)
+                    quarantined.append(invalid)
+                # Nullable integer types would be kept in pandas metadata of partitions
+                Operations.to_numpy_types(df).to_parquet(target, index=False)
+
+            quarantined = [q for q in quarantined if len(q) > 0]
+            if len(quarantined) > 0:
+                quarantine = os.path.join(config.validation.quarantine_root, f'year={year}', f'month={month}')
+                os.makedirs(quarantine, exist_ok=True)
+                pd.concat(quarantined, ignore_index=True).drop(columns=['month', 'year']) \
+                    .to_parquet(os.path.join(quarantine, 'green_tripdata.parquet'), index=False)
+        finally:
+            if remove:
+                os.remove(path)
+
+        if validator is not None:
+            print(validator.report())
+
+    @staticmethod
+    def get_main_data(dimensions, root=None):
+        """
+        Get data from db, or from parquet partitions if root is given, encode zones and add some features to be used in
+         figures. Trips keep only integer zone and borough keys, names are in dimensions. Months are read in parallel
+         over a pool of `load_workers` connections and keep their year and month, rows of a month are contiguous.
+
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param str or None root: Root directory of parquet partitions, data is read from db if none
         :return: Data to use in figures
         :rtype: pd.DataFrame
         """
         op = Operations
+        workers = config.dashboard.load_workers
+        if root is not None:
+            directories = op.get_parquet_partitions(root)
+            partitions = list(directories)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(lambda p: op.get_parquet_data(directories[p]), partitions))
+        else:
+            engine = postgres_engine(config.postgres_db, pool_size=workers)
+
+            # Months are disjoint ranges of the year and month indexes, each read over its own connection
+            partitions = op.get_partitions()
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    chunks = list(executor.map(lambda p: op.get_data(engine, *p), partitions))
+            finally:
+                engine.dispose()
 
-        all_data = []
-        for page in range(1, 11):
-            data_chunk = op.get_data(page=page, size=750000)
-            all_data = all_data + data_chunk
-
-        df = pd.DataFrame(all_data)
-        zones.columns = ['PULocationID', 'PUBorough', 'PUZone', 'PUservice_zone']
-        merged = df.merge(zones, how='left', on='PULocationID')
-        zones.columns = ['DOLocationID', 'DOBorough', 'DOZone', 'DOservice_zone']
-        merged = merged.merge(zones, how='left', on='DOLocationID')
-        merged['lpep_pickup_datetime'] = pd.to_datetime(merged['lpep_pickup_datetime'],
-                                                        format='%Y-%m-%d %H:%M:%S')
-        merged['lpep_dropoff_datetime'] = pd.to_datetime(merged['lpep_dropoff_datetime'],
-                                                         format='%Y-%m-%d %H:%M:%S')
-        merged['weekday'] = merged['lpep_pickup_datetime'].apply(lambda x: x.weekday())
-        merged['hour'] = merged['lpep_pickup_datetime'].apply(lambda x: x.hour)
-        merged['trip_time'] = (merged['lpep_dropoff_datetime'] - merged['lpep_pickup_datetime'])
-        merged['trip_time'] = merged['trip_time'].apply(lambda x: round(x.seconds / 60))
-        return merged
+        df = pd.concat(chunks, ignore_index=True)
+        lengths = [len(chunk) for chunk in chunks]
+        df['year'] = np.repeat(np.array([year for year, _ in partitions], dtype=np.int16), lengths)
+        df['month'] = np.repeat(np.array([month for _, month in partitions], dtype=np.int8), lengths)
+        df['PULocationID'], df['PUBoroughID'] = dimensions.encode(df['PULocationID'])
+        df['DOLocationID'], df['DOBoroughID'] = dimensions.encode(df['DOLocationID'])
+        df['lpep_pickup_datetime'] = pd.to_datetime(df['lpep_pickup_datetime'], format='%Y-%m-%d %H:%M:%S')
+        df['lpep_dropoff_datetime'] = pd.to_datetime(df['lpep_dropoff_datetime'], format='%Y-%m-%d %H:%M:%S')
+        df['weekday'] = df['lpep_pickup_datetime'].dt.weekday.astype(np.int8)
+        df['hour'] = df['lpep_pickup_datetime'].dt.hour.astype(np.int8)
+        df['trip_time'] = ((df['lpep_dropoff_datetime'] - df['lpep_pickup_datetime']).dt.seconds / 60).round()
+        return df
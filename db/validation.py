@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+from db.model import Quarantine
+from util.config import config
+
+# Reason codes of quarantined records, a record failing several rules carries the sum of their codes
+REASONS = {
+    'month': 1,  # pick up time missing or outside the month of the file
+    'amount': 2,  # total amount missing, negative or zero
+    'distance': 4,  # trip distance missing, negative or zero
+    'zone': 8,  # pick up or drop off zone missing, not in zones or in an Unknown borough
+}
+
+
+def _numbers(records, name):
+    """
+    Return column of records as floats, missing values as nan.
+
+    :param records: pd.DataFrame or pa.RecordBatch of records
+    :param str name: Column name
+    :return: Values
+    :rtype: np.ndarray
+    """
+    if isinstance(records, pd.DataFrame):
+        return records[name].to_numpy(dtype='float64', na_value=np.nan)
+    return records.column(name).to_numpy(zero_copy_only=False).astype('float64')
+
+
+def _times(records, name):
+    """
+    Return column of records as datetimes, missing values as NaT.
+
+    :param records: pd.DataFrame or pa.RecordBatch of records
+    :param str name: Column name
+    :return: Values
+    :rtype: np.ndarray
+    """
+    if isinstance(records, pd.DataFrame):
+        return pd.to_datetime(records[name]).to_numpy(dtype='datetime64[ns]')
+    return records.column(name).to_numpy(zero_copy_only=False).astype('datetime64[ns]')
+
+
+class Validator:
+    """
+    Vectorized validation of green taxi records of a monthly file. Records failing any of the rules are split off with
+     their reason codes to be quarantined, counts of records failing each rule are kept across batches.
+    """
+    def __init__(self, year, month, dimensions, rules=tuple(REASONS)):
+        """
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :param Dimensions dimensions: Zone and borough dimensions
+        :param rules: Rules to check, from REASONS
+        """
+        unknown = set(rules) - set(REASONS)
+        if len(unknown) > 0:
+            raise Exception(f'Unknown validation rules {sorted(unknown)}')
+        self.year = int(year)
+        self.month = int(month)
+        self.rules = [rule for rule in REASONS if rule in rules]
+        self.start = np.datetime64(f'{self.year:04d}-{self.month:02d}', 'M').astype('datetime64[ns]')
+        self.end = (np.datetime64(f'{self.year:04d}-{self.month:02d}', 'M') + 1).astype('datetime64[ns]')
+
+        zones = dimensions.zones
+        self.zones = np.zeros(len(dimensions.zone_borough), dtype=bool)
+        self.zones[zones.loc[zones['Borough'] != 'Unknown', 'LocationID']] = True
+
+        self.records = 0
+        self.quarantined = 0
+        self.counts = {rule: 0 for rule in self.rules}
+
+    @classmethod
+    def from_config(cls, year, month, dimensions):
+        """
+        Return validator with rules of `validation` config, none if there are no rules.
+
+        :param year: Year of taxi data
+        :param month: Month of taxi data
+        :param Dimensions dimensions: Zone and borough dimensions
+        :return: Validator
+        :rtype: Validator or None
+        """
+        rules = config.validation.rules
+        # A single rule is not parsed as a list
+        rules = [rules] if isinstance(rules, str) else rules
+        rules = [rule for rule in rules if len(rule) > 0]
+        return cls(year, month, dimensions, rules) if len(rules) > 0 else None
+
+    def known(self, location_ids):
+        """
+        Return whether zone ids are known zones.
+
+        :param np.ndarray location_ids: Zone ids as floats, missing values as nan
+        :return: Mask of known zones
+        :rtype: np.ndarray
+        """
+        ids = np.nan_to_num(location_ids, nan=-1).astype(np.int64)
+        valid = (ids >= 0) & (ids < len(self.zones))
+        return valid & self.zones[np.where(valid, ids, 0)]
+
+    def reasons(self, records):
+        """
+        Return reason codes of records, zero for valid records.
+
+        :param records: pd.DataFrame or pa.RecordBatch of records
+        :return: Reason codes
+        :rtype: np.ndarray
+        """
+        reasons = np.zeros(len(records), dtype=np.int16)
+        if 'month' in self.rules:
+            pickup = _times(records, 'lpep_pickup_datetime')
+            reasons[~((pickup >= self.start) & (pickup < self.end))] |= REASONS['month']
+        if 'amount' in self.rules:
+            reasons[~(_numbers(records, 'total_amount') > 0)] |= REASONS['amount']
+        if 'distance' in self.rules:
+            reasons[~(_numbers(records, 'trip_distance') > 0)] |= REASONS['distance']
+        if 'zone' in self.rules:
+            known = self.known(_numbers(records, 'PULocationID')) & self.known(_numbers(records, 'DOLocationID'))
+            reasons[~known] |= REASONS['zone']
+        return reasons
+
+    def split(self, records):
+        """
+        Split records into valid records and quarantined records. Quarantined records keep columns of `Quarantine`.
+
+        :param records: pd.DataFrame or pa.RecordBatch of records with uid
+        :return: Valid and quarantined records, of the same type as records
+        :rtype: tuple
+        """
+        reasons = self.reasons(records)
+        invalid = reasons != 0
+        self.records += len(records)
+        self.quarantined += int(np.count_nonzero(invalid))
+        for rule in self.rules:
+            self.counts[rule] += int(np.count_nonzero(reasons & REASONS[rule]))
+
+        columns = [c for c in Quarantine.__table__.columns.keys() if c not in ['reasons', 'month', 'year']]
+        n = int(np.count_nonzero(invalid))
+        if isinstance(records, pd.DataFrame):
+            quarantined = records.loc[invalid, columns].assign(
+                reasons=reasons[invalid],
+                month=self.month,
+                year=self.year,
+            )
+            return records[~invalid], quarantined
+
+        import pyarrow as pa
+
+        quarantined = records.filter(pa.array(invalid)).select(columns) \
+            .append_column('reasons', pa.array(reasons[invalid])) \
+            .append_column('month', pa.array([self.month] * n, pa.int64())) \
+            .append_column('year', pa.array([self.year] * n, pa.int64()))
+        return records.filter(pa.array(~invalid)), quarantined
+
+    def report(self):
+        """
+        Return counts of checked and quarantined records, and of records failing each rule.
+
+        :return: Report
+        :rtype: str
+        """
+        counts = ', '.join(f'{rule}: {count}' for rule, count in self.counts.items())
+        return f'Quarantined {self.quarantined} of {self.records} records ({counts})'
@@ -1,5 +1,7 @@
+from analytics import Dimensions
 from db import Base, postgres_engine
 from db.operations import Operations
+from db.validation import Validator
 from util import parse_args
 from util.config import config
 
@@ -9,13 +11,23 @@ def main():
     year = args.get('year')
     month = args.get('month')
     create_table = args.get('create_table')
+    sink = args.get('sink')
+    fmt = args.get('format')
 
+    # Dimension tables are written from zones csv, records of db are validated against them
+    dimensions = Dimensions.from_csv()
     if create_table:
         Base.metadata.create_all(postgres_engine(config.postgres_db))
+        Operations.write_dimensions(dimensions)
 
     op = Operations()
-    fname = op.get_taxi_data(year=year, month=month)
-    op.write(path=fname, year=year, month=month)
+    fname = op.get_taxi_data(year=year, month=month, fmt=fmt)
+    if sink in ['parquet', 'both']:
+        op.write_parquet(path=fname, year=year, month=month, root=config.parquet.root, remove=sink == 'parquet',
+                         validator=Validator.from_config(year, month, dimensions))
+    if sink in ['db', 'both']:
+        op.write(path=fname, year=year, month=month,
+                 validator=Validator.from_config(year, month, op.get_dimensions()))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,290 @@
+import plotly.express as px
+import plotly.graph_objects as go
+from analytics import kpi_metrics, to_store
+from util.config import config
+from util.figure import compact, compact_template, to_payload
+
+
+template = compact_template('plotly_dark')
+all_days = (0, 1, 2, 3, 4, 5, 6)
+payment_types = {
+    1: 'Credit card',
+    2: 'Cash',
+    3: 'No charge',
+    4: 'Dispute',
+    5: 'Unknown',
+    6: 'Voided trip',
+}
+
+
+def draw_sunburst_pu(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Sunburst chart for pick up boroughs.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Sunburst chart
+    :rtype: go.Figure
+    """
+    gp = state.backend.aggregate(
+        ['PUBoroughID', 'PULocationID'], {'value': ('VendorID', 'count')}, hours, days, months
+    )
+    gp = state.dimensions.label(gp, boroughs={'PUBorough': 'PUBoroughID'}, zones={'PUZone': 'PULocationID'})
+
+    return px.sunburst(gp, path=['PUBorough', 'PUZone'], values='value') \
+        .update_layout(
+        template=template,
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+    )
+
+
+def draw_sunburst_do(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Sunburst chart for drop off boroughs.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Sunburst chart
+    :rtype: go.Figure
+    """
+    gp = state.backend.aggregate(
+        ['DOBoroughID', 'DOLocationID'], {'value': ('VendorID', 'count')}, hours, days, months
+    )
+    gp = state.dimensions.label(gp, boroughs={'DOBorough': 'DOBoroughID'}, zones={'DOZone': 'DOLocationID'})
+
+    return px.sunburst(gp, path=['DOBorough', 'DOZone'], values='value') \
+        .update_layout(
+        template=template,
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+    )
+
+
+def draw_sankey(state, hours=(0, 23), days=all_days, boro='Manhattan', months=None):
+    """
+    Return a sankey diagram that takes given pick up borough as source and every other borough except itself as drop off
+     destination, and then takes each drop off borough as source to all zones of said boroughs.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param boro: Pick up borough to select as source
+    :param months: Selected months, all months if none
+    :return: Sankey diagram
+    :rtype: go.Figure
+    """
+    source, target, value = state.od.sankey_links(hours, days, boro, months)
+
+    return go.Figure(
+                data=[go.Sankey(
+                    node=dict(
+                        pad=15,
+                        thickness=20,
+                        line=dict(
+                            width=0.5,
+                            color='rgba(255, 0, 255, 0.65)'
+                        ),
+                        label=state.od.labels
+                    ),
+                    link=dict(
+                        source=source,
+                        target=target,
+                        value=value
+                    )
+                )]
+            ).update_layout(
+                template=template,
+                plot_bgcolor='rgba(0, 0, 0, 0)',
+                paper_bgcolor='rgba(0, 0, 0, 0)',
+            )
+
+
+def gdraw_line1(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Return a line chart that shows total trip counts by pick up borough for weekdays.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Line chart
+    :rtype: go.Figure
+    """
+    gr = state.backend.aggregate(
+        ['PUBoroughID', 'weekday'], {'trip_counts': ('VendorID', 'count')}, hours, days, months
+    )
+    gr = state.dimensions.label(gr, boroughs={'PUBorough': 'PUBoroughID'}).sort_values(['PUBorough', 'weekday'])
+    return px.line(gr, x='weekday', y='trip_counts', color='PUBorough')\
+        .update_layout(
+            template=template,
+            plot_bgcolor='rgba(0, 0, 0, 0)',
+            paper_bgcolor='rgba(0, 0, 0, 0)',
+        )
+
+
+def gdraw_line2(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Return a line chart that shows total trip counts by drop off borough for weekdays.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Line chart
+    :rtype: go.Figure
+    """
+    gr = state.backend.aggregate(
+        ['DOBoroughID', 'weekday'], {'trip_counts': ('VendorID', 'count')}, hours, days, months
+    )
+    gr = state.dimensions.label(gr, boroughs={'DOBorough': 'DOBoroughID'}).sort_values(['DOBorough', 'weekday'])
+    return px.line(gr, x='weekday', y='trip_counts', color='DOBorough')\
+        .update_layout(
+            template=template,
+            plot_bgcolor='rgba(0, 0, 0, 0)',
+            paper_bgcolor='rgba(0, 0, 0, 0)',
+        )
+
+
+def draw_bar(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Return a bar chart that shows total amount paid for taxi rides by payment type for weekdays.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Bar chart
+    :rtype: go.Figure
+    """
+    gr = state.backend.aggregate(['payment_type', 'weekday'], {'total_amount': ('total_amount', 'sum')}, hours, days,
+                                  months)
+    gr['payment_type'] = gr['payment_type'].map(lambda code: payment_types.get(code, code))
+    return px.bar(gr, x='weekday', y='total_amount', color='payment_type', barmode='group') \
+        .update_layout(
+        template=template,
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+    )
+
+
+def draw_trip_time(state, hours=(0, 23), days=all_days, months=None):
+    """
+    Return a chart that shows distribution of trip times, from sketches of selected hours and days.
+
+    :param hours: Selected hours range
+    :param days: Selected days
+    :param months: Selected months, all months if none
+    :return: Distribution chart
+    :rtype: go.Figure
+    """
+    sketch = state.sketches['trip_time']
+    values, counts = sketch.distribution(hours, days, months)
+    # Bin 0 stands for 0, which the log axis drops, so it is drawn at the largest value it holds
+    values = values.clip(min=sketch.bins.min_value)
+    return go.Figure(
+                data=[go.Scatter(
+                    x=values,
+                    y=counts,
+                    mode='lines',
+                    line_shape='hvh',
+                    fill='tozeroy',
+                    hovertemplate='trip_time=%{x:.1f}<br>trip_counts=%{y}<extra></extra>',
+                )]
+            ).update_layout(
+                template=template,
+                plot_bgcolor='rgba(0, 0, 0, 0)',
+                paper_bgcolor='rgba(0, 0, 0, 0)',
+                xaxis=dict(title='trip_time (min)', type='log'),
+                yaxis=dict(title='trip_counts'),
+            )
+
+
+def get_cube(state):
+    """
+    Return data pre-aggregated by month, hour, weekday and borough or payment type, to be shipped once to the browser
+     and filtered there by clientside callbacks. Months are shipped as their positions on the month slider.
+
+    Built once and kept in state, like when it is loaded from artifacts.
+
+    :param DashboardState state: State of dashboard
+    :return: Cuboids and base layout for clientside figures
+    :rtype: dict
+    """
+    if state.cube is not None:
+        return state.cube
+    positions = {year * 100 + month: i for i, (year, month) in enumerate(state.months)}
+
+    def aggregate(by, metrics):
+        cube = state.backend.aggregate(['year', 'month', 'hour', 'weekday', by], metrics, dropna=False)
+        cube['month'] = (cube['year'].astype('int64') * 100 + cube['month']).map(positions)
+        return cube.drop(columns='year')
+
+    pu = aggregate('PUBoroughID', {
+        **kpi_metrics,
+        'vendor_trips': ('VendorID', 'count'),
+    })
+    do = aggregate('DOBoroughID', {'vendor_trips': ('VendorID', 'count')})
+    payment = aggregate('payment_type', {'total_amount': ('total_amount', 'sum')})
+
+    state.cube = compact({
+        'initial_length': int(state.totals['trips']),
+        'layout': {
+            'template': template.to_plotly_json(),
+            'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+            'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        },
+        'pu': to_store(pu, labels={'PUBoroughID': state.dimensions.borough_names}),
+        'do': to_store(do, labels={'DOBoroughID': state.dimensions.borough_names}),
+        'payment': to_store(payment, labels={'payment_type': payment_types}),
+    }, precision=config.dashboard.float_precision)
+    return state.cube
+
+
+def serialize(fig):
+    """
+    Serialize figure with configured compaction.
+
+    :param go.Figure fig: Figure to serialize
+    :return: Serialized figure
+    :rtype: dict
+    """
+    return to_payload(fig, precision=config.dashboard.float_precision, typed_arrays=config.dashboard.typed_arrays)
+
+
+def get_figure(state, name, draw, hours, days=all_days, months=None, **kwargs):
+    """
+    Return serialized figure for given filter inputs from figure cache of state, drawing it only on first request.
+
+    :param DashboardState state: State of dashboard
+    :param str name: Name of figure
+    :param draw: Function that draws figure of state for hours range, days and months
+    :param tuple hours: Selected hours range
+    :param tuple days: Selected days
+    :param tuple or None months: Selected months, all months if none
+    :param kwargs: Extra arguments of draw function
+    :return: Serialized figure
+    :rtype: dict
+    """
+    return state.figure_cache.get(
+        (name, hours, days, months, *sorted(kwargs.items())),
+        lambda: serialize(draw(state, hours=hours, days=days, months=months, **kwargs))
+    )
+
+
+def draw_defaults(state):
+    """
+    Draw figures of the layout for default filters, and sankey diagrams of every pick up borough, to figure cache of
+     state.
+
+    :param DashboardState state: State of dashboard
+    """
+    for name, draw in [
+        ('sunburst-pu', draw_sunburst_pu),
+        ('sunburst-do', draw_sunburst_do),
+        ('gdraw-line1', gdraw_line1),
+        ('gdraw-line2', gdraw_line2),
+        ('draw-bar', draw_bar),
+        ('trip-time', draw_trip_time),
+    ]:
+        get_figure(state, name, draw, (0, 23))
+    for borough in state.boroughs:
+        get_figure(state, 'sankey-diagram', draw_sankey, (0, 23), boro=borough)
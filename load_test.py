@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from analytics import Dimensions
+from configobj import ConfigObj
+
+
+def parse_args():
+    """
+    Parse arguments
+
+    :return: dict of params
+    :rtype: dict
+    """
+    parser = argparse.ArgumentParser(description='Replay dashboard filter sequences of concurrent users')
+    parser.add_argument('--users', help='comma separated user counts, one stage each', type=str, default='1,2,4,8,16')
+    parser.add_argument('--duration', help='seconds of every stage', type=float, default=30)
+    parser.add_argument('--think', help='mean seconds between user actions', type=float, default=1.0)
+    parser.add_argument('--backend', help='backend of server', type=str, default='pandas', choices=['pandas', 'duckdb'])
+    parser.add_argument('--months', help='number of synthetic months', type=int, default=3)
+    parser.add_argument('--trips', help='number of synthetic trips per month', type=int, default=200000)
+    parser.add_argument('--root', help='parquet root to keep synthetic data in, or to reuse', type=str, default=None)
+    parser.add_argument('--port', help='port of server', type=int, default=8051)
+    parser.add_argument('--timeout', help='seconds to wait for server to start', type=float, default=600)
+    parser.add_argument('--output', help='json file to write stage results to', type=str, default=None)
+    parser.add_argument('--seed', help='random seed', type=int, default=0)
+    parser.add_argument('--serve', help=argparse.SUPPRESS, action='store_true')
+
+    # _: config.ini file
+    args, _ = parser.parse_known_args()
+    return args.__dict__
+
+
+def synthesize(root, months, trips, seed=0):
+    """
+    Write synthetic green taxi data as year=YYYY/month=MM parquet partitions, like `Operations.write_parquet`. Zones
+     are drawn with skewed popularity and trip times, distances and amounts are log-normal. The last month goes through
+     csv ingest of `Operations.write_parquet`, with missing integer values like in TLC files.
+
+    :param str root: Root directory of partitions
+    :param int months: Number of months, starting from 2019-01
+    :param int trips: Number of trips per month
+    :param int seed: Random seed
+    """
+    from db.model import GreenTaxi
+    from db.operations import Operations
+
+    rng = np.random.default_rng(seed)
+    zones = Dimensions.from_csv().zones['LocationID'].to_numpy()
+    popularity = 1 / np.arange(1, len(zones) + 1) ** 0.8
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    for i in range(months):
+        year, month = 2019 + i // 12, i % 12 + 1
+        start = pd.Timestamp(year=year, month=month, day=1)
+        seconds = (start + pd.offsets.MonthBegin(1) - start).total_seconds()
+        pickup = start + pd.to_timedelta(rng.uniform(0, seconds, trips).round(), unit='s')
+        trip_time = pd.to_timedelta(rng.lognormal(6.6, 0.6, trips).round(), unit='s')
+        distance = rng.lognormal(0.7, 0.8, trips).round(2)
+        fare = (2.5 + 2.5 * distance + rng.normal(0, 1, trips)).clip(0).round(2)
+
+        df = pd.DataFrame({
+            'VendorID': rng.choice([1, 2], trips, p=[0.2, 0.8]),
+            'lpep_pickup_datetime': pickup,
+            'lpep_dropoff_datetime': pickup + trip_time,
+            'PULocationID': rng.choice(zones, trips, p=popularity),
+            'DOLocationID': rng.choice(zones, trips, p=popularity),
+            'passenger_count': rng.choice([1, 2, 3, 4, 5, 6], trips, p=[0.8, 0.1, 0.04, 0.02, 0.03, 0.01]),
+            'trip_distance': distance,
+            'fare_amount': fare,
+            'total_amount': (fare * rng.uniform(1, 1.3, trips) + 0.8).round(2),
+            'payment_type': rng.choice([1, 2, 3, 4, 5], trips, p=[0.5, 0.45, 0.03, 0.015, 0.005]),
+        })
+        if i == months - 1:
+            missing = rng.random(trips) < 0.01
+            for column in ['VendorID', 'passenger_count', 'payment_type']:
+                df[column] = df[column].where(~missing)
+            # Columns of csv are matched by position
+            path = os.path.join(root, f'green_tripdata_{year}-{month:02d}.csv')
+            df.reindex(columns=GreenTaxi.__table__.columns.keys()[1:21]).to_csv(path, index=False)
+            Operations.write_parquet(path=path, year=str(year), month=f'{month:02d}', root=root)
+            continue
+
+        partition = os.path.join(root, f'year={year}', f'month={month:02d}')
+        os.makedirs(partition, exist_ok=True)
+        df.to_parquet(os.path.join(partition, 'green_tripdata.parquet'), index=False)
+
+
+def write_config(base, path, root, backend):
+    """
+    Write config of server, serving data under root with given backend and server side callbacks, without artifacts.
+
+    :param str base: Path of config to start from
+    :param str path: Path of config to write
+    :param str root: Root directory of parquet partitions
+    :param str backend: pandas or duckdb
+    :return: Path of config
+    :rtype: str
+    """
+    conf = ConfigObj(base)
+    conf['dashboard']['backend'] = backend
+    conf['dashboard']['source'] = 'parquet'
+    conf['dashboard']['clientside'] = 'false'
+    conf['parquet']['root'] = root
+    if 'artifacts' in conf:
+        conf['artifacts']['version'] = ''
+    conf.filename = path
+    conf.write()
+    return path
+
+
+def serve(port):
+    """
+    Run dashboard server, with config given as last argument.
+
+    :param int port: Port of server
+    """
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app.server.run(host='127.0.0.1', port=port, threaded=True)
+
+
+def rss(pid):
+    """
+    Return resident memory of a process in MB, none where /proc is not available.
+
+    :param int pid: Process id
+    :return: Resident memory
+    :rtype: float or None
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def find(component, id):
+    """
+    Find component of given id in a serialized layout.
+
+    :param component: Serialized layout
+    :param str id: Id of component
+    :return: Props of component, none if not found
+    :rtype: dict or None
+    """
+    if isinstance(component, list):
+        for child in component:
+            props = find(child, id)
+            if props is not None:
+                return props
+    elif isinstance(component, dict):
+        props = component.get('props', {})
+        if props.get('id') == id:
+            return props
+        return find(props.get('children'), id)
+    return None
+
+
+class User:
+    """
+    Dashboard user replaying filter sequences: dragging hours slider one hour at a time, toggling days, switching
+     sankey borough and switching between a single month and the full period. Every step is one callback request with
+     all filter values.
+    """
+    def __init__(self, callback, boroughs, months, think, rng):
+        """
+        :param dict callback: Server callback from `_dash-dependencies`
+        :param list boroughs: Pick up borough options
+        :param int months: Number of months on month slider
+        :param float think: Mean seconds between actions
+        :param random.Random rng: Random generator
+        """
+        self.callback = callback
+        self.outputs = [
+            dict(zip(['id', 'property'], output.rsplit('.', 1)))
+            for output in callback['output'].strip('.').split('...')
+        ]
+        self.boroughs = boroughs
+        self.months = months
+        self.think = think
+        self.rng = rng
+        self.state = {'hours': [0, 23], 'days': [], 'borough': 'Manhattan', 'months': [0, max(months - 1, 0)]}
+
+    def payload(self, changed):
+        """
+        Return callback request of current filter values.
+
+        :param str changed: Id of changed filter
+        :return: Request body
+        :rtype: dict
+        """
+        return {
+            'output': self.callback['output'],
+            'outputs': self.outputs,
+            'inputs': [
+                {'id': i['id'], 'property': i['property'], 'value': self.state.get(i['id'])}
+                for i in self.callback['inputs']
+            ],
+            'changedPropIds': [f'{changed}.value'],
+            'state': [],
+        }
+
+    def actions(self):
+        """
+        Yield changed filter and pause before next step of a random action.
+
+        :return: Changed filter id and pause in seconds
+        :rtype: Iterator[tuple]
+        """
+        rng = self.rng
+        action = rng.choice(['hours', 'hours', 'days', 'borough', 'months'])
+        if action == 'hours':
+            end = rng.randrange(2)
+            for _ in range(rng.randint(2, 6)):
+                hours = self.state['hours']
+                hours[end] = min(max(hours[end] + rng.choice([-1, 1]), 0), 23)
+                self.state['hours'] = sorted(hours)
+                yield 'hours', rng.uniform(0.05, 0.15)
+        elif action == 'days':
+            day = rng.randrange(7)
+            days = self.state['days']
+            self.state['days'] = sorted(set(days) - {day}) if day in days else sorted(days + [day])
+            yield 'days', 0
+        elif action == 'borough':
+            self.state['borough'] = rng.choice(self.boroughs)
+            yield 'borough', 0
+        else:
+            month = rng.randrange(self.months)
+            full = [0, self.months - 1]
+            self.state['months'] = full if self.state['months'] != full else [month, month]
+            yield 'months', 0
+
+    async def run(self, session, url, deadline, results):
+        """
+        Replay actions until deadline, appending latency in seconds and status of every request to results.
+
+        :param aiohttp.ClientSession session: Client session
+        :param str url: Update component url
+        :param float deadline: Loop time to stop at
+        :param list results: Results of stage
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.rng.uniform(0, self.think))
+        while loop.time() < deadline:
+            for changed, pause in self.actions():
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=self.payload(changed)) as response:
+                        await response.read()
+                        status = response.status
+                except Exception:
+                    status = None
+                results.append((time.perf_counter() - start, status))
+                await asyncio.sleep(pause)
+            await asyncio.sleep(self.rng.expovariate(1 / self.think) if self.think > 0 else 0)
+
+
+async def wait_ready(session, url, timeout):
+    """
+    Wait until server serves layout.
+
+    :param aiohttp.ClientSession session: Client session
+    :param str url: Base url of server
+    :param float timeout: Seconds to wait
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url + '_dash-layout') as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(1)
+    raise TimeoutError(f'Server did not start in {timeout} seconds')
+
+
+async def run(url, pid, users, duration, think, timeout, seed=0):
+    """
+    Run a stage for every user count against server and collect its metrics.
+
+    :param str url: Base url of server
+    :param int pid: Process id of server
+    :param list users: User counts of stages
+    :param float duration: Seconds of every stage
+    :param float think: Mean seconds between user actions
+    :param float timeout: Seconds to wait for server to start
+    :param int seed: Random seed
+    :return: Metrics of stages
+    :rtype: list
+    """
+    import aiohttp
+
+    rng = random.Random(seed)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await wait_ready(session, url, timeout)
+        async with session.get(url + '_dash-dependencies') as response:
+            dependencies = await response.json()
+        async with session.get(url + '_dash-layout') as response:
+            layout = await response.json()
+
+        # Server callback with the most outputs is update_all
+        callback = max(
+            (d for d in dependencies if not d.get('clientside_function')),
+            key=lambda d: d['output'].count('...')
+        )
+        boroughs = [option['value'] for option in find(layout, 'borough')['options']]
+        months = find(layout, 'months')['max'] + 1
+
+        stages = []
+        for count in users:
+            results, memory = [], []
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            deadline = start + duration
+            tasks = [
+                asyncio.create_task(
+                    User(callback, boroughs, months, think, random.Random(rng.random()))
+                    .run(session, url + '_dash-update-component', deadline, results)
+                ) for _ in range(count)
+            ]
+            while not all(task.done() for task in tasks):
+                memory.append(rss(pid))
+                await asyncio.sleep(0.25)
+            await asyncio.gather(*tasks)
+            elapsed = loop.time() - start
+
+            latencies = np.array([latency for latency, status in results if status == 200]) * 1000
+            percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) > 0 else [np.nan] * 3
+            memory = [m for m in memory if m is not None]
+            stages.append({
+                'users': count,
+                'requests': len(results),
+                'errors': sum(status != 200 for _, status in results),
+                'throughput': len(latencies) / elapsed,
+                'p50': percentiles[0],
+                'p95': percentiles[1],
+                'p99': percentiles[2],
+                'rss': max(memory) if len(memory) > 0 else None,
+            })
+            print(report(stages[-1:], header=len(stages) == 1), flush=True)
+        return stages
+
+
+def report(stages, header=True):
+    """
+    Format metrics of stages as a table.
+
+    :param list stages: Metrics of stages
+    :param bool header: Include header
+    :return: Table
+    :rtype: str
+    """
+    lines = [f'{"users":>6} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+             f'{"rss MB":>8}'] if header else []
+    for s in stages:
+        rss_mb = f'{s["rss"]:8.0f}' if s['rss'] is not None else f'{"-":>8}'
+        lines.append(f'{s["users"]:>6} {s["requests"]:>9} {s["errors"]:>7} {s["throughput"]:8.1f} {s["p50"]:8.1f} '
+                     f'{s["p95"]:8.1f} {s["p99"]:8.1f} {rss_mb}')
+    return '\n'.join(lines)
+
+
+def main():
+    args = parse_args()
+    config = sys.argv[-1] if sys.argv[-1].endswith('.ini') else os.environ.get('CONFIG', 'default.ini')
+    if args['serve']:
+        serve(args['port'])
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.abspath(args['root'] or os.path.join(tmp, 'parquet'))
+        if not os.path.exists(root) or len(os.listdir(root)) == 0:
+            print(f'Writing {args["months"]} months of {args["trips"]:,d} synthetic trips to {root}', flush=True)
+            os.makedirs(root, exist_ok=True)
+            os.environ.setdefault('CONFIG', config)
+            synthesize(root, args['months'], args['trips'], seed=args['seed'])
+        path = write_config(config, os.path.join(tmp, 'load_test.ini'), root, args['backend'])
+
+        # Server runs in its own process, so its memory is measured alone
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args['port']), path],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={k: v for k, v in os.environ.items() if k != 'CONFIG'},
+        )
+        try:
+            stages = asyncio.run(run(
+                url=f'http://127.0.0.1:{args["port"]}/',
+                pid=server.pid,
+                users=[int(u) for u in args['users'].split(',')],
+                duration=args['duration'],
+                think=args['think'],
+                timeout=args['timeout'],
+                seed=args['seed'],
+            ))
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args['output'] is not None:
+        with open(args['output'], 'w') as f:
+            json.dump(stages, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
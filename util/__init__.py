@@ -34,6 +34,10 @@ def parse_args():
     parser.add_argument('--year', help='year of taxi data', required=False, type=str, default='2019')
     parser.add_argument('--month', help='month of taxi data', required=False, type=str, default='01')
     parser.add_argument('--create_table', help='create_table if not created before', required=False, default=False)
+    parser.add_argument('--sink', help='where to write taxi data', required=False, type=str, default='db',
+                        choices=['db', 'parquet', 'both'])
+    parser.add_argument('--format', help='file format of taxi data', required=False, type=str, default='csv',
+                        choices=['csv', 'parquet'])
 
     # _: config.ini file
     args, _ = parser.parse_known_args()
@@ -0,0 +1,167 @@
+import base64
+import json
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from collections import OrderedDict
+from threading import Lock
+
+# Layout keys of a template that matter for the cartesian, sunburst and sankey figures of the dashboard
+TEMPLATE_KEYS = [
+    'autotypenumbers', 'colorway', 'font', 'hovermode', 'hoverlabel',
+    'paper_bgcolor', 'plot_bgcolor', 'title', 'xaxis', 'yaxis',
+]
+
+# Smallest typed array dtypes understood by plotly.js, in order of preference
+INT_DTYPES = [
+    ('i1', np.int8), ('u1', np.uint8), ('i2', np.int16),
+    ('u2', np.uint16), ('i4', np.int32), ('u4', np.uint32),
+]
+
+
+def compact_template(name='plotly_dark'):
+    """
+    Return given plotly template reduced to the layout keys used by dashboard figures. Full templates carry defaults
+     for every trace type and are serialized into each figure, which makes them the largest part of small figures.
+
+    :param str name: Name of registered plotly template
+    :return: Reduced template
+    :rtype: go.layout.Template
+    """
+    layout = pio.templates[name].layout.to_plotly_json()
+    return go.layout.Template(layout={k: v for k, v in layout.items() if k in TEMPLATE_KEYS})
+
+
+def _is_numeric(values):
+    """
+    Check list holds only numbers.
+
+    :param list values: List to check
+    :return: true if list is numeric, false otherwise
+    :rtype: bool
+    """
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+
+
+def _typed_array(values):
+    """
+    Encode numeric list as plotly.js typed array spec with base64 data.
+
+    :param list values: Numeric list
+    :return: Typed array spec
+    :rtype: dict
+    """
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.integer) or np.all(np.mod(arr, 1) == 0):
+        for name, dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if arr.min() >= info.min and arr.max() <= info.max:
+                arr = arr.astype(dtype)
+                break
+        else:
+            name, arr = 'f8', arr.astype(np.float64)
+    else:
+        name, arr = 'f8', arr.astype(np.float64)
+    return {'dtype': name, 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+
+
+def compact(obj, precision=2, typed_arrays=False, min_length=8):
+    """
+    Shrink numeric arrays of a serialized figure. Floats are rounded to given precision and whole floats are written as
+     integers, long arrays are optionally encoded as base64 typed arrays which needs plotly.js 2.28 or newer.
+
+    :param obj: Serialized figure or any part of it
+    :param int precision: Number of decimals to keep for floats
+    :param bool typed_arrays: Encode long numeric arrays as typed arrays
+    :param int min_length: Minimum array length to encode as typed array
+    :return: Compacted object
+    """
+    if isinstance(obj, dict):
+        return {k: compact(v, precision, typed_arrays, min_length) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if len(obj) > 0 and _is_numeric(obj):
+            values = [compact(v, precision) for v in obj]
+            if typed_arrays and len(values) >= min_length:
+                return _typed_array(values)
+            return values
+        return [compact(v, precision, typed_arrays, min_length) for v in obj]
+    if isinstance(obj, float):
+        value = round(obj, precision)
+        return int(value) if value.is_integer() else value
+    return obj
+
+
+def to_payload(fig, precision=2, typed_arrays=False):
+    """
+    Serialize figure once and return compacted plain JSON object, which Dash can send without validating or
+     re-encoding the figure.
+
+    :param go.Figure fig: Figure to serialize
+    :param int precision: Number of decimals to keep for floats
+    :param bool typed_arrays: Encode long numeric arrays as typed arrays
+    :return: Serialized figure
+    :rtype: dict
+    """
+    return compact(json.loads(pio.to_json(fig, validate=False)), precision=precision, typed_arrays=typed_arrays)
+
+
+class FigureCache:
+    """
+    Thread safe LRU cache of dashboard payloads keyed by the exact inputs used to build them.
+    """
+    def __init__(self, size=256):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, build):
+        """
+        Return cached payload for key, or build and cache it.
+
+        :param tuple key: Hashable inputs of payload
+        :param build: Function without arguments that returns payload
+        :return: Payload
+        """
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+
+        payload = build()
+        with self.lock:
+            self.items[key] = payload
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """
+        Drop all cached payloads.
+        """
+        with self.lock:
+            self.items.clear()
+
+    def dump(self):
+        """
+        Return cached figures as JSON serializable key and payload pairs, other payloads like components are skipped.
+
+        :return: Key and payload pairs, least recently used first
+        :rtype: list
+        """
+        with self.lock:
+            return [[list(key), payload] for key, payload in self.items.items() if isinstance(payload, dict)]
+
+    def load(self, items):
+        """
+        Add key and payload pairs from `dump` to cache.
+
+        :param list items: Key and payload pairs
+        """
+        def freeze(value):
+            return tuple(freeze(v) for v in value) if isinstance(value, list) else value
+
+        with self.lock:
+            for key, payload in items:
+                self.items[freeze(key)] = payload
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)